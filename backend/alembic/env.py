@@ -1,14 +1,17 @@
 from logging.config import fileConfig
-from sqlalchemy import engine_from_config
 from sqlalchemy import pool
+from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
+import asyncio
 import os
+import re
 import sys
 
 # Add the parent directory to the path so we can import our app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
 from app.models import *  # Import all models
+from app.core.config import settings
 from sqlmodel import SQLModel
 
 # this is the Alembic Config object, which provides
@@ -16,10 +19,14 @@ from sqlmodel import SQLModel
 config = context.config
 
 # Interpret the config file for Python logging.
-# This line sets up loggers basically.
-if config.config_file_name is not None:
+# This line sets up loggers basically. Callers passing their own connection
+# keep their logging as it is.
+if config.config_file_name is not None and "connection" not in config.attributes:
     fileConfig(config.config_file_name)
 
+# Migrate the database the app is configured for
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 target_metadata = SQLModel.metadata
@@ -54,29 +61,62 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
+# Monthly and default partitions of messages (PostgreSQL), managed outside the models
+MESSAGE_PARTITION = re.compile(r"^messages_(\d{4}_\d{2}|default)$")
+
+
+def include_for_dialect(dialect_name: str):
+    """Skip indexes declared with ``ddl_if(dialect=...)`` for another dialect,
+    and the partitions of ``messages``."""
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == "table" and MESSAGE_PARTITION.match(name):
+            return False
+        if type_ == "index" and MESSAGE_PARTITION.match(object.table.name):
+            return False
+        ddl_if = getattr(object, "_ddl_if", None)
+        if type_ == "index" and ddl_if is not None and ddl_if.dialect is not None:
+            return ddl_if.dialect == dialect_name
+        return True
+
+    return include_object
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_for_dialect(connection.dialect.name),
+        # SQLite cannot ALTER most things in place
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
-    In this scenario we need to create an Engine
-    and associate a connection with the context.
+    DATABASE_URL uses an async driver, so the migrations run on an async
+    engine through ``run_sync``.
 
     """
-    connectable = engine_from_config(
+    connectable = async_engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
     )
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection, target_metadata=target_metadata
-        )
+    async with connectable.connect() as connection:
+        await connection.run_sync(do_run_migrations)
 
-        with context.begin_transaction():
-            context.run_migrations()
+    await connectable.dispose()
 
 
 if context.is_offline_mode():
     run_migrations_offline()
+elif config.attributes.get("connection") is not None:
+    # Called from inside a running event loop (see app.core.migrations.upgrade_to_head)
+    do_run_migrations(config.attributes["connection"])
 else:
-    run_migrations_online()
\ No newline at end of file
+    asyncio.run(run_migrations_online())
\ No newline at end of file
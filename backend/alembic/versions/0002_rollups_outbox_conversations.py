@@ -0,0 +1,84 @@
+"""Add analytics rollups, email outbox and conversation state
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 22:46:45.394843
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_messages_booking_id'), 'messages', ['booking_id'], unique=False)
+
+    op.create_index('ix_listings_available_price', 'listings', ['is_available', 'price_per_day'], unique=False)
+
+    op.create_table('email_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recipient', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('subject', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('body', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'SENDING', 'SENT', 'FAILED', name='emailstatus'), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.create_index('ix_email_outbox_status_next_attempt', 'email_outbox', ['status', 'next_attempt_at'], unique=False)
+
+    op.create_table('listing_monthly_stats',
+    sa.Column('listing_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('request_count', sa.Integer(), nullable=False),
+    sa.Column('confirmed_count', sa.Integer(), nullable=False),
+    sa.Column('declined_count', sa.Integer(), nullable=False),
+    sa.Column('booked_days', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('owner_id', sa.Uuid(), nullable=False),
+    sa.ForeignKeyConstraint(['listing_id'], ['listings.id'], ),
+    sa.ForeignKeyConstraint(['owner_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('listing_id', 'month')
+    )
+
+    op.create_index(op.f('ix_listing_monthly_stats_owner_id'), 'listing_monthly_stats', ['owner_id'], unique=False)
+
+    op.create_table('conversation_state',
+    sa.Column('booking_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Uuid(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=True),
+    sa.Column('last_message_at', sa.DateTime(), nullable=True),
+    sa.Column('last_read_message_id', sa.Integer(), nullable=True),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['booking_id'], ['bookings.id'], ),
+    sa.ForeignKeyConstraint(['last_message_id'], ['messages.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('booking_id', 'user_id')
+    )
+
+    op.create_index('ix_conversation_state_user_last_message', 'conversation_state', ['user_id', 'last_message_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversation_state_user_last_message', table_name='conversation_state')
+    op.drop_table('conversation_state')
+    op.drop_index(op.f('ix_listing_monthly_stats_owner_id'), table_name='listing_monthly_stats')
+    op.drop_table('listing_monthly_stats')
+    op.drop_index('ix_email_outbox_status_next_attempt', table_name='email_outbox')
+    op.drop_table('email_outbox')
+    op.drop_index('ix_listings_available_price', table_name='listings')
+    op.drop_index(op.f('ix_messages_booking_id'), table_name='messages')
+
+    # PostgreSQL keeps the enum type after its table is dropped
+    sa.Enum(name='emailstatus').drop(op.get_bind(), checkfirst=True)
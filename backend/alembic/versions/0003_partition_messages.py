@@ -0,0 +1,178 @@
+"""Partition messages by month and add the message archive
+
+On PostgreSQL ``messages`` becomes a table range partitioned on ``sent_at``
+with one partition per month (``messages_YYYY_MM``) and a default partition.
+Every unique key of a partitioned table must include the partition key, so
+the primary key becomes ``(id, sent_at)`` and the foreign key from
+``conversation_state.last_message_id`` is dropped. Other databases keep a
+single table. Partitions for later months are created by
+``python -m app.services.message_archive``.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 23:20:11.508214
+
+"""
+from alembic import context, op
+from datetime import date, datetime, timedelta
+import sqlalchemy as sa
+import json
+import uuid
+import zlib
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Names the unnamed SQLite foreign key so batch mode can drop it
+SQLITE_NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+SQLITE_LAST_MESSAGE_FK = "fk_conversation_state_last_message_id_messages"
+POSTGRES_LAST_MESSAGE_FK = "conversation_state_last_message_id_fkey"
+
+MESSAGE_COLUMNS = "content, id, booking_id, sender_id, receiver_id, sent_at"
+
+# Months created ahead of the current one. Fixed here rather than read from
+# the app settings so the revision replays the same way whatever they say
+# later; app.services.message_archive keeps creating partitions from then on.
+PARTITIONS_AHEAD = 3
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def _create_monthly_partitions(first: date, last: date):
+    month = first
+    while month <= last:
+        following = _next_month(month)
+        op.execute(
+            f"CREATE TABLE messages_{month:%Y_%m} PARTITION OF messages "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+
+
+def _partition_messages():
+    op.drop_index('ix_messages_booking_id', table_name='messages')
+    op.execute("ALTER TABLE messages RENAME TO messages_unpartitioned")
+    op.execute("ALTER TABLE messages_unpartitioned RENAME CONSTRAINT messages_pkey TO messages_unpartitioned_pkey")
+    op.execute("""
+        CREATE TABLE messages (
+            content VARCHAR NOT NULL,
+            id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+            booking_id INTEGER NOT NULL REFERENCES bookings (id),
+            sender_id UUID NOT NULL REFERENCES users (id),
+            receiver_id UUID NOT NULL REFERENCES users (id),
+            sent_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT messages_pkey PRIMARY KEY (id, sent_at)
+        ) PARTITION BY RANGE (sent_at)
+    """)
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.create_index('ix_messages_booking_sent_at', 'messages', ['booking_id', 'sent_at'], unique=False)
+
+    current_month = date.today().replace(day=1)
+    first_month = current_month
+    if not context.is_offline_mode():
+        oldest = op.get_bind().execute(sa.text("SELECT min(sent_at) FROM messages_unpartitioned")).scalar()
+        if oldest is not None:
+            first_month = min(first_month, oldest.date().replace(day=1))
+    last_month = current_month
+    for _ in range(PARTITIONS_AHEAD):
+        last_month = _next_month(last_month)
+    _create_monthly_partitions(first_month, last_month)
+    op.execute("CREATE TABLE messages_default PARTITION OF messages DEFAULT")
+
+    op.execute(f"INSERT INTO messages ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM messages_unpartitioned")
+    op.execute("DROP TABLE messages_unpartitioned")
+
+
+def _unpartition_messages():
+    op.execute("ALTER TABLE messages RENAME TO messages_partitioned")
+    op.execute("ALTER TABLE messages_partitioned RENAME CONSTRAINT messages_pkey TO messages_partitioned_pkey")
+    op.execute("""
+        CREATE TABLE messages (
+            content VARCHAR NOT NULL,
+            id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+            booking_id INTEGER NOT NULL REFERENCES bookings (id),
+            sender_id UUID NOT NULL REFERENCES users (id),
+            receiver_id UUID NOT NULL REFERENCES users (id),
+            sent_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            CONSTRAINT messages_pkey PRIMARY KEY (id)
+        )
+    """)
+    op.execute("ALTER SEQUENCE messages_id_seq OWNED BY messages.id")
+    op.execute(f"INSERT INTO messages ({MESSAGE_COLUMNS}) SELECT {MESSAGE_COLUMNS} FROM messages_partitioned")
+    # Drops the partitions with it
+    op.execute("DROP TABLE messages_partitioned")
+    op.create_index(op.f('ix_messages_booking_id'), 'messages', ['booking_id'], unique=False)
+
+
+def _restore_archived_messages():
+    """Put archived conversations back into messages before the archive is dropped."""
+    if context.is_offline_mode():
+        return
+    bind = op.get_bind()
+    messages = sa.table(
+        'messages',
+        sa.column('content', sa.String()),
+        sa.column('id', sa.Integer()),
+        sa.column('booking_id', sa.Integer()),
+        sa.column('sender_id', sa.Uuid()),
+        sa.column('receiver_id', sa.Uuid()),
+        sa.column('sent_at', sa.DateTime()),
+    )
+    for (payload,) in bind.execute(sa.text("SELECT payload FROM messages_archive")):
+        rows = json.loads(zlib.decompress(payload))
+        for row in rows:
+            row["sender_id"] = uuid.UUID(row["sender_id"])
+            row["receiver_id"] = uuid.UUID(row["receiver_id"])
+            row["sent_at"] = datetime.fromisoformat(row["sent_at"])
+        if rows:
+            bind.execute(messages.insert(), rows)
+
+
+def upgrade() -> None:
+    dialect = op.get_context().dialect.name
+
+    if dialect == 'postgresql':
+        op.drop_constraint(POSTGRES_LAST_MESSAGE_FK, 'conversation_state', type_='foreignkey')
+        _partition_messages()
+    else:
+        with op.batch_alter_table('conversation_state', naming_convention=SQLITE_NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(SQLITE_LAST_MESSAGE_FK, type_='foreignkey')
+        op.drop_index('ix_messages_booking_id', table_name='messages')
+        op.create_index('ix_messages_booking_sent_at', 'messages', ['booking_id', 'sent_at'], unique=False)
+
+    op.create_table('messages_archive',
+    sa.Column('booking_id', sa.Integer(), nullable=False),
+    sa.Column('message_count', sa.Integer(), nullable=False),
+    sa.Column('first_sent_at', sa.DateTime(), nullable=False),
+    sa.Column('last_sent_at', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['booking_id'], ['bookings.id'], ),
+    sa.PrimaryKeyConstraint('booking_id')
+    )
+    if dialect == 'postgresql':
+        # The payload is compressed already; keep TOAST from trying again
+        op.execute("ALTER TABLE messages_archive ALTER COLUMN payload SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    dialect = op.get_context().dialect.name
+
+    _restore_archived_messages()
+    op.drop_table('messages_archive')
+
+    if dialect == 'postgresql':
+        _unpartition_messages()
+        op.create_foreign_key(POSTGRES_LAST_MESSAGE_FK, 'conversation_state', 'messages', ['last_message_id'], ['id'])
+    else:
+        op.drop_index('ix_messages_booking_sent_at', table_name='messages')
+        op.create_index(op.f('ix_messages_booking_id'), 'messages', ['booking_id'], unique=False)
+        with op.batch_alter_table('conversation_state') as batch_op:
+            batch_op.create_foreign_key(SQLITE_LAST_MESSAGE_FK, 'messages', ['last_message_id'], ['id'])
@@ -0,0 +1,42 @@
+"""Store listing vehicle types as JSONB with a GIN index on PostgreSQL
+
+Vehicle type filters use JSONB containment (``@>``), which the GIN index
+serves. Other databases keep the JSON column and filter with ``LIKE``.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:12:40.118026
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    op.alter_column('listings', 'vehicle_types',
+               existing_type=sa.JSON(),
+               type_=postgresql.JSONB(),
+               existing_nullable=True,
+               postgresql_using='vehicle_types::jsonb')
+    op.create_index('ix_listings_vehicle_types', 'listings', ['vehicle_types'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_listings_vehicle_types', table_name='listings', postgresql_using='gin')
+    op.alter_column('listings', 'vehicle_types',
+               existing_type=postgresql.JSONB(),
+               type_=sa.JSON(),
+               existing_nullable=True,
+               postgresql_using='vehicle_types::json')
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.routes import auth, users, listings, bookings, websocket
+from app.api.routes import auth, users, listings, bookings, websocket, admin
 
 api_router = APIRouter()
 
@@ -7,4 +7,5 @@ api_router.include_router(auth.router, tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(listings.router, prefix="/listings", tags=["listings"])
 api_router.include_router(bookings.router, prefix="/bookings", tags=["bookings"])
-api_router.include_router(websocket.router, prefix="/ws", tags=["websocket"])
\ No newline at end of file
+api_router.include_router(websocket.router, prefix="/ws", tags=["websocket"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
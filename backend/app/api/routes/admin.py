@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import PlainTextResponse
+from app.api.deps import get_current_admin_user
+from app.core.config import settings
+from app.core.profiler import ProfilerBusy, profile_thread
+from app.models.user import User
+from datetime import datetime
+import asyncio
+import os
+import threading
+
+router = APIRouter()
+
+
+def profiler_enabled():
+    """Hide the profiler, before authentication, unless PROFILER_ENABLED is set."""
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profiler is disabled"
+        )
+
+
+# Dependencies listed on the decorator are resolved before the endpoint's own
+@router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(profiler_enabled)])
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, description="How long to sample the worker"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Sampling interval"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Sample this worker's event loop and return collapsed stacks for a flamegraph."""
+    if seconds > settings.PROFILER_MAX_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds must be at most {settings.PROFILER_MAX_SECONDS}"
+        )
+    
+    try:
+        async with profile_thread(threading.get_ident(), interval_ms / 1000) as profiler:
+            # The event loop keeps serving other requests while it is sampled
+            await asyncio.sleep(seconds)
+    except ProfilerBusy:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A profile is already running in this worker"
+        )
+    
+    collapsed = profiler.collapsed()
+    headers = {"X-Profile-Samples": str(profiler.samples)}
+    
+    if settings.PROFILER_OUTPUT_DIR:
+        filename = f"profile-{os.getpid()}-{datetime.utcnow():%Y%m%dT%H%M%S}.collapsed"
+        path = os.path.join(settings.PROFILER_OUTPUT_DIR, filename)
+        await asyncio.to_thread(_write_profile, path, collapsed)
+        headers["X-Profile-Path"] = path
+    
+    return PlainTextResponse(collapsed, headers=headers)
+
+
+def _write_profile(path: str, collapsed: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(collapsed)
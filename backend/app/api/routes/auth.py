@@ -7,6 +7,7 @@ from app.core.security import verify_password, get_password_hash, create_access_
 from app.models.user import User, UserCreate, UserRead
 from datetime import timedelta
 from app.core.config import settings
+import asyncio
 
 router = APIRouter()
 
@@ -28,8 +29,8 @@ async def register_user(
             detail="Email already registered"
         )
     
-    # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    # Hash password and create user; bcrypt runs off the event loop
+    hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
     db_user = User(
         email=user_data.email,
         first_name=user_data.first_name,
@@ -56,7 +57,10 @@ async def login_for_access_token(
     result = await session.exec(statement)
     user = result.first()
     
-    if not user or not verify_password(form_data.password, user.password):
+    # bcrypt takes tens of milliseconds of CPU; in a thread it leaves the event
+    # loop serving other routes, and the admission rule for this route bounds
+    # how many checks run at once
+    if not user or not await asyncio.to_thread(verify_password, form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -1,15 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import select, and_
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlmodel import select, and_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_session
-from app.api.deps import get_current_active_user
+from app.api.deps import get_current_active_user, batch_ids
 from app.models.user import User
-from app.models.booking import Booking, BookingCreate, BookingRead, BookingUpdate
+from app.models.booking import Booking, BookingCreate, BookingRead, BookingReadExpanded, BookingUpdate
 from app.models.listing import Listing
-from typing import List
+from app.services.analytics import record_booking_change
+from app.services.booking_expansion import expand_options, expanded_bookings, parse_expand
+from app.services.email_dispatcher import dispatcher
+from app.services.notifications import notify_booking_requested, notify_booking_status_changed
+from typing import List, Optional
 
 router = APIRouter()
 
+EXPAND_DESCRIPTION = "Comma-separated related rows to include: listing, guest, owner, invoice"
+
+
+def _parse_expand(expand: Optional[str]):
+    try:
+        return parse_expand(expand)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
 
 @router.post("/", response_model=BookingRead)
 async def create_booking(
@@ -18,10 +34,9 @@ async def create_booking(
     current_user: User = Depends(get_current_active_user)
 ):
     """Create a new booking request."""
-    # Check if listing exists and is available
-    statement = select(Listing).where(Listing.id == booking_data.listing_id)
-    result = await session.exec(statement)
-    listing = result.first()
+    # Check if listing exists and is available; read in the booking's own
+    # transaction rather than from a detached loader snapshot
+    listing = await session.get(Listing, booking_data.listing_id)
     
     if not listing:
         raise HTTPException(
@@ -44,34 +59,66 @@ async def create_booking(
     # Create booking
     db_booking = Booking(**booking_data.dict(), guest_id=current_user.id)
     session.add(db_booking)
+    await session.flush()
+    await record_booking_change(session, db_booking, listing.owner_id)
+    await notify_booking_requested(session, db_booking, listing, current_user)
     await session.commit()
+    dispatcher.wake()
     await session.refresh(db_booking)
     return db_booking
 
 
-@router.get("/me/bookings", response_model=List[BookingRead])
+@router.get("/me/bookings", response_model=List[BookingReadExpanded], response_model_exclude_unset=True)
 async def read_user_bookings(
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all bookings made by the current user."""
-    statement = select(Booking).where(Booking.guest_id == current_user.id)
+    expansions = _parse_expand(expand)
+    statement = select(Booking).where(Booking.guest_id == current_user.id).options(
+        *expand_options(expansions)
+    )
     result = await session.exec(statement)
     bookings = result.all()
-    return bookings
+    return expanded_bookings(bookings, expansions)
 
 
-@router.get("/me/rents", response_model=List[BookingRead])
+@router.get("/me/rents", response_model=List[BookingReadExpanded], response_model_exclude_unset=True)
 async def read_user_rents(
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
     session: AsyncSession = Depends(get_session),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get all booking requests for listings owned by the current user."""
+    expansions = _parse_expand(expand)
     # Join bookings with listings to find bookings for user's listings
-    statement = select(Booking).join(Listing).where(Listing.owner_id == current_user.id)
+    statement = select(Booking).join(Listing).where(Listing.owner_id == current_user.id).options(
+        *expand_options(expansions)
+    )
     result = await session.exec(statement)
     bookings = result.all()
-    return bookings
+    return expanded_bookings(bookings, expansions)
+
+
+@router.get("/batch", response_model=List[BookingRead])
+async def read_bookings_batch(
+    ids: List[int] = Depends(batch_ids),
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get several bookings by ID in one request.
+
+    Only bookings the current user made or received are returned; other and
+    missing IDs are skipped.
+    """
+    statement = select(Booking).join(Listing).where(
+        Booking.id.in_(ids),
+        (Booking.guest_id == current_user.id) | (Listing.owner_id == current_user.id)
+    )
+    result = await session.exec(statement)
+    bookings = {booking.id: booking for booking in result.all()}
+    return [bookings[booking_id] for booking_id in ids if booking_id in bookings]
 
 
 @router.patch("/{booking_id}", response_model=BookingRead)
@@ -96,10 +143,25 @@ async def update_booking_status(
         )
     
     # Update status
-    if booking_update.status:
-        booking.status = booking_update.status
+    if booking_update.status and booking_update.status != booking.status:
+        old_status = booking.status
+        # Conditional on the status read above, so of two concurrent changes
+        # only one applies its rollup delta
+        result = await session.exec(
+            update(Booking)
+            .where(Booking.id == booking.id, Booking.status == old_status)
+            .values(status=booking_update.status)
+        )
+        if result.rowcount != 1:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Booking status was changed concurrently"
+            )
+        await record_booking_change(session, booking, current_user.id, old_status)
+        await notify_booking_status_changed(session, booking)
     
     session.add(booking)
     await session.commit()
+    dispatcher.wake()
     await session.refresh(booking)
     return booking
\ No newline at end of file
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlmodel import select, and_
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_session
-from app.api.deps import get_current_active_user
+from sqlalchemy.orm import sessionmaker
+from app.core.database import get_session, get_sessionmaker
+from app.api.deps import get_current_active_user, batch_ids
 from app.models.user import User
-from app.models.listing import Listing, ListingCreate, ListingRead, ListingUpdate
-from typing import List, Optional
+from app.models.listing import Listing, ListingCreate, ListingRead, ListingUpdate, ListingSearchResult
+from app.services.listing_search import ListingFilters, compute_facets, parse_facets, parse_vehicle_type
+from app.services.loaders import listing_loader
+from typing import List, Optional, Union
 from decimal import Decimal
 
 router = APIRouter()
@@ -25,7 +28,7 @@ async def create_listing(
     return db_listing
 
 
-@router.get("/", response_model=List[ListingRead])
+@router.get("/", response_model=Union[List[ListingRead], ListingSearchResult])
 async def read_listings(
     session: AsyncSession = Depends(get_session),
     region: Optional[str] = Query(None, description="Filter by city or state"),
@@ -34,49 +37,67 @@ async def read_listings(
     vehicle_type: Optional[str] = Query(None, description="Filter by vehicle type"),
     long_term: Optional[bool] = Query(None, description="Filter for long-term rentals"),
     short_term: Optional[bool] = Query(None, description="Filter for short-term rentals"),
+    facets: Optional[str] = Query(
+        None,
+        description="Comma-separated facet counts to include: city, vehicle_type, price, term or all"
+    ),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100)
 ):
-    """Get all listings with optional filters."""
-    statement = select(Listing).where(Listing.is_available == True)
-    
-    # Apply filters
-    if region:
-        statement = statement.where(
-            (Listing.city.ilike(f"%{region}%")) | 
-            (Listing.state.ilike(f"%{region}%"))
+    """Get all listings with optional filters.
+
+    When ``facets`` is given the listings are wrapped in an object together
+    with facet counts for the whole filtered result set.
+    """
+    try:
+        facet_names = parse_facets(facets)
+        vehicle_type = parse_vehicle_type(vehicle_type)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
         )
     
-    if min_price is not None:
-        statement = statement.where(Listing.price_per_day >= min_price)
-    
-    if max_price is not None:
-        statement = statement.where(Listing.price_per_day <= max_price)
+    filters = ListingFilters(
+        region=region,
+        min_price=min_price,
+        max_price=max_price,
+        vehicle_type=vehicle_type,
+        long_term=long_term,
+        short_term=short_term,
+    )
     
-    if vehicle_type:
-        statement = statement.where(Listing.vehicle_types.contains([vehicle_type]))
-    
-    if long_term is not None:
-        statement = statement.where(Listing.is_long_term == long_term)
+    statement = filters.apply(select(Listing)).offset(skip).limit(limit)
+    result = await session.exec(statement)
+    listings = result.all()
     
-    if short_term is not None:
-        statement = statement.where(Listing.is_short_term == short_term)
+    if not facet_names:
+        return listings
     
-    statement = statement.offset(skip).limit(limit)
+    listing_facets = await compute_facets(session, filters, facet_names)
+    return ListingSearchResult(items=listings, facets=listing_facets)
+
+
+@router.get("/batch", response_model=List[ListingRead])
+async def read_listings_batch(
+    ids: List[int] = Depends(batch_ids),
+    session: AsyncSession = Depends(get_session)
+):
+    """Get several listings by ID in one request; missing IDs are skipped."""
+    statement = select(Listing).where(Listing.id.in_(ids))
     result = await session.exec(statement)
-    listings = result.all()
-    return listings
+    listings = {listing.id: listing for listing in result.all()}
+    return [listings[listing_id] for listing_id in ids if listing_id in listings]
 
 
 @router.get("/{listing_id}", response_model=ListingRead)
 async def read_listing(
     listing_id: int,
-    session: AsyncSession = Depends(get_session)
+    session_local: sessionmaker = Depends(get_sessionmaker)
 ):
     """Get a single listing by ID."""
-    statement = select(Listing).where(Listing.id == listing_id)
-    result = await session.exec(statement)
-    listing = result.first()
+    # Concurrent requests for listings are answered by one query
+    listing = await listing_loader.load(listing_id, session_local)
     
     if not listing:
         raise HTTPException(
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlmodel import select
+from sqlalchemy import and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_session
 from app.api.deps import get_current_active_user
 from app.models.user import User, UserRead
 from app.models.listing import Listing, ListingRead
 from app.models.invoice import Invoice, InvoiceRead
-from typing import List
+from app.models.conversation import ConversationState, InboxEntry
+from app.models.message import Message
+from app.models.analytics import ListingMonthlyStats, ListingMonthlyStatsRead
+from app.services.analytics import month_start
+from typing import List, Optional
+from datetime import date
 
 router = APIRouter()
 
@@ -40,4 +46,60 @@ async def read_user_invoices(
     statement = select(Invoice).where(Invoice.user_id == current_user.id)
     result = await session.exec(statement)
     invoices = result.all()
-    return invoices
\ No newline at end of file
+    return invoices
+
+
+@router.get("/me/analytics", response_model=List[ListingMonthlyStatsRead])
+async def read_user_analytics(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user),
+    listing_id: Optional[int] = Query(None, description="Restrict to a single listing"),
+    from_month: Optional[date] = Query(None, description="First month to include"),
+    to_month: Optional[date] = Query(None, description="Last month to include")
+):
+    """Get monthly occupancy and revenue for the current user's listings."""
+    statement = select(ListingMonthlyStats).where(
+        ListingMonthlyStats.owner_id == current_user.id
+    )
+    
+    if listing_id is not None:
+        statement = statement.where(ListingMonthlyStats.listing_id == listing_id)
+    
+    if from_month is not None:
+        statement = statement.where(ListingMonthlyStats.month >= month_start(from_month))
+    
+    if to_month is not None:
+        statement = statement.where(ListingMonthlyStats.month <= month_start(to_month))
+    
+    statement = statement.order_by(ListingMonthlyStats.listing_id, ListingMonthlyStats.month)
+    result = await session.exec(statement)
+    stats = result.all()
+    return stats
+
+
+@router.get("/me/inbox", response_model=List[InboxEntry])
+async def read_user_inbox(
+    session: AsyncSession = Depends(get_session),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get the current user's booking conversations, most recent first."""
+    statement = (
+        select(ConversationState, Message)
+        # sent_at narrows the lookup to one partition of the partitioned messages table
+        .outerjoin(Message, and_(
+            Message.id == ConversationState.last_message_id,
+            Message.sent_at == ConversationState.last_message_at,
+        ))
+        .where(ConversationState.user_id == current_user.id)
+        .order_by(ConversationState.last_message_at.desc())
+    )
+    result = await session.exec(statement)
+    return [
+        InboxEntry(
+            booking_id=state.booking_id,
+            unread_count=state.unread_count,
+            last_read_message_id=state.last_read_message_id,
+            last_message=message,
+        )
+        for state, message in result.all()
+    ]
@@ -1,22 +1,33 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, status, Query
-from sqlmodel import select
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_session
+from app.core.database import get_session, AsyncSessionLocal
+from app.core.metrics import counter, gauge
 from app.core.security import verify_token
 from app.models.user import User
-from app.models.booking import Booking
 from app.models.message import Message, MessageCreate
-from app.models.listing import Listing
-from typing import Dict, List
+from app.services.conversations import record_message, mark_read
+from app.services.message_archive import conversation_history
+from app.services.loaders import booking_loader, listing_loader, user_loader
+from typing import Any, Dict, List, Optional
+import asyncio
 import json
 import uuid
 
 router = APIRouter()
 
+websocket_messages_total = counter(
+    "websocket_messages_total",
+    "Chat frames sent to WebSocket clients",
+)
+
+
 # Store active WebSocket connections
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[int, List[WebSocket]] = {}
+        self.pending_sends = 0
+    
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.active_connections.values())
     
     async def connect(self, websocket: WebSocket, booking_id: int):
         await websocket.accept()
@@ -25,23 +36,64 @@ class ConnectionManager:
         self.active_connections[booking_id].append(websocket)
     
     def disconnect(self, websocket: WebSocket, booking_id: int):
-        if booking_id in self.active_connections:
+        if websocket in self.active_connections.get(booking_id, ()):
             self.active_connections[booking_id].remove(websocket)
             if not self.active_connections[booking_id]:
                 del self.active_connections[booking_id]
     
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
+        websocket_messages_total.inc()
     
     async def broadcast_to_booking(self, message: str, booking_id: int):
         if booking_id in self.active_connections:
-            for connection in self.active_connections[booking_id]:
-                await connection.send_text(message)
+            connections = list(self.active_connections[booking_id])
+            remaining = len(connections)
+            self.pending_sends += remaining
+            try:
+                for connection in connections:
+                    await connection.send_text(message)
+                    remaining -= 1
+                    self.pending_sends -= 1
+                    websocket_messages_total.inc()
+            finally:
+                self.pending_sends -= remaining
 
 manager = ConnectionManager()
 
+gauge(
+    "websocket_connections_active",
+    "Open chat WebSocket connections in this worker",
+    callback=lambda: {(): manager.connection_count()},
+)
+gauge(
+    "websocket_broadcast_pending_sends",
+    "Broadcast frames queued behind in-progress sends in this worker",
+    callback=lambda: {(): manager.pending_sends},
+)
+
 
-async def get_user_from_token(token: str, session: AsyncSession) -> User:
+def parse_frame(data: str) -> Optional[Dict[str, Any]]:
+    """Return a client frame if it is a read receipt or a chat message, else ``None``."""
+    try:
+        frame = json.loads(data)
+    except ValueError:
+        return None
+    if not isinstance(frame, dict):
+        return None
+    if frame.get("type") == "read":
+        message_id = frame.get("message_id")
+        # bool is an int subclass; a receipt for message True is not one
+        if isinstance(message_id, int) and not isinstance(message_id, bool) and message_id > 0:
+            return frame
+        return None
+    content = frame.get("content")
+    if isinstance(content, str) and content.strip():
+        return frame
+    return None
+
+
+async def get_user_from_token(token: str) -> User:
     """Get user from JWT token for WebSocket authentication."""
     try:
         payload = verify_token(token)
@@ -50,9 +102,8 @@ async def get_user_from_token(token: str, session: AsyncSession) -> User:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
         
         user_uuid = uuid.UUID(user_id)
-        statement = select(User).where(User.id == user_uuid)
-        result = await session.exec(statement)
-        user = result.first()
+        # Reconnect storms open many sockets at once; their lookups share queries
+        user = await user_loader.load(user_uuid, AsyncSessionLocal)
         
         if user is None or not user.is_active:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
@@ -72,24 +123,18 @@ async def websocket_chat(
     # Get database session
     async with AsyncSessionLocal() as session:
         try:
-            # Authenticate user
-            current_user = await get_user_from_token(token, session)
-            
-            # Verify user has access to this booking
-            statement = select(Booking).join(Listing).where(
-                Booking.id == booking_id
+            # Authenticate user and verify they have access to this booking
+            current_user, booking = await asyncio.gather(
+                get_user_from_token(token),
+                booking_loader.load(booking_id, AsyncSessionLocal),
             )
-            result = await session.exec(statement)
-            booking = result.first()
             
             if not booking:
                 await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
                 return
             
             # Check if user is either the guest or the listing owner
-            listing_statement = select(Listing).where(Listing.id == booking.listing_id)
-            listing_result = await session.exec(listing_statement)
-            listing = listing_result.first()
+            listing = await listing_loader.load(booking.listing_id, AsyncSessionLocal)
             
             if current_user.id != booking.guest_id and current_user.id != listing.owner_id:
                 await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
@@ -99,11 +144,7 @@ async def websocket_chat(
             await manager.connect(websocket, booking_id)
             
             # Send message history
-            history_statement = select(Message).where(
-                Message.booking_id == booking_id
-            ).order_by(Message.sent_at)
-            history_result = await session.exec(history_statement)
-            messages = history_result.all()
+            messages = await conversation_history(session, booking)
             
             for message in messages:
                 message_data = {
@@ -120,7 +161,31 @@ async def websocket_chat(
             # Listen for new messages
             while True:
                 data = await websocket.receive_text()
-                message_data = json.loads(data)
+                message_data = parse_frame(data)
+                if message_data is None:
+                    # A bad frame is the client's mistake; keep the socket open
+                    error_data = {
+                        "type": "error",
+                        "detail": 'Expected {"content": "..."} or {"type": "read", "message_id": N}'
+                    }
+                    await manager.send_personal_message(json.dumps(error_data), websocket)
+                    continue
+                
+                # Read receipts move the sender's last-read marker forward
+                if message_data.get("type") == "read":
+                    state = await mark_read(
+                        session, booking_id, current_user.id, message_data["message_id"]
+                    )
+                    if state is not None:
+                        receipt_data = {
+                            "type": "read",
+                            "user_id": str(current_user.id),
+                            "message_id": state.last_read_message_id
+                        }
+                        await manager.broadcast_to_booking(
+                            json.dumps(receipt_data), booking_id
+                        )
+                    continue
                 
                 # Determine receiver (the other party in the booking)
                 if current_user.id == booking.guest_id:
@@ -137,6 +202,8 @@ async def websocket_chat(
                 )
                 
                 session.add(new_message)
+                await session.flush()
+                await record_message(session, new_message)
                 await session.commit()
                 await session.refresh(new_message)
                 
@@ -154,7 +221,10 @@ async def websocket_chat(
                 )
                 
         except WebSocketDisconnect:
-            manager.disconnect(websocket, booking_id)
+            pass
         except Exception as e:
             print(f"WebSocket error: {e}")
-            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
\ No newline at end of file
+            await websocket.close(code=status.WS_1011_INTERNAL_ERROR)
+        finally:
+            # Sockets rejected before connecting were never registered
+            manager.disconnect(websocket, booking_id)
\ No newline at end of file
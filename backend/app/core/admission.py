@@ -0,0 +1,331 @@
+"""Admission control for expensive routes.
+
+Each rule in ``ADMISSION_RULES`` applies to one ``"METHOD /path"`` template
+(``WS`` for WebSocket routes) and may combine:
+
+- ``concurrency``/``queue``/``queue_timeout``: at most ``concurrency``
+  requests run at once in this worker and at most ``queue`` wait for a slot.
+  Requests beyond the queue, or waiting longer than ``queue_timeout``
+  seconds, get an immediate 503 with ``Retry-After``. For WebSockets the slot
+  is held for the lifetime of the socket.
+- ``rate``/``burst``: a token bucket per client (the bearer token's user or
+  the client address, taken from ``X-Forwarded-For`` behind a trusted proxy).
+  An empty bucket answers 429 with ``Retry-After``.
+- ``message_rate``/``message_burst`` (WebSocket only): a token bucket per
+  socket; frames beyond it are delayed rather than dropped, so a chatty
+  client slows itself down without starving other sockets.
+- ``exempt_params``: query parameters that take a request out of the
+  per-client token bucket, e.g. the filters that make a listing search cheap,
+  mapped to their default. Only a value that narrows the result exempts the
+  request: an empty value never does, and for a numeric default (a lower
+  bound such as ``min_price``) neither does a value at or below it. Otherwise
+  ``min_price=0`` would make a full scan look filtered. The concurrency limit
+  still applies, since a filter that narrows the result can still be slow.
+- ``costly_params``: query parameters that keep a request in the token bucket
+  whatever else it sets, e.g. ``facets``, which aggregates over every match.
+
+Rejected WebSocket handshakes get the same 429/503 response with
+``Retry-After`` when the server supports WebSocket denial responses;
+otherwise the socket is accepted and closed with code 1013 (try again
+later), since closing before the accept reaches the client as a 403.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional
+from urllib.parse import parse_qsl
+from .cache import TTLCache
+from .config import settings
+from .metrics import counter, gauge
+from .security import token_subject
+import asyncio
+import json
+import math
+import re
+import time
+
+WS_TRY_AGAIN_LATER = 1013
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token; return 0, or the seconds until one is available."""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Take a token even if that leaves a debt; return how long to wait for it."""
+        self._refill()
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class ConcurrencyLimit:
+    def __init__(self, limit: int, queue: int, queue_timeout: float):
+        self.limit = limit
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self) -> bool:
+        """Wait for a slot; return ``False`` if the queue is full or the wait times out."""
+        if self._semaphore.locked() and self.waiting >= self.queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+
+@dataclass
+class Rule:
+    name: str
+    scope_type: str
+    method: Optional[str]
+    pattern: "re.Pattern[str]"
+    concurrency: Optional[ConcurrencyLimit] = None
+    rate: Optional[float] = None
+    burst: Optional[float] = None
+    message_rate: Optional[float] = None
+    message_burst: Optional[float] = None
+    exempt_params: Dict[str, Any] = field(default_factory=dict)
+    costly_params: FrozenSet[str] = field(default_factory=frozenset)
+
+
+def _compile_path(path: str) -> "re.Pattern[str]":
+    parts = re.split(r"(\{[^}]+\})", path)
+    return re.compile("^" + "".join(
+        "[^/]+" if part.startswith("{") else re.escape(part) for part in parts
+    ) + "$")
+
+
+def _exempt_params(params) -> Dict[str, Any]:
+    # A plain list of names means none of them has a default
+    if isinstance(params, dict):
+        return dict(params)
+    return dict.fromkeys(params)
+
+
+def narrows(value: str, default: Any) -> bool:
+    """Whether a query parameter set to ``value`` narrows the result compared to ``default``."""
+    value = value.strip()
+    if not value:
+        return False
+    if isinstance(default, (int, float)) and not isinstance(default, bool):
+        try:
+            return float(value) > default
+        except ValueError:
+            # Rejected by the route before it queries anything
+            return False
+    return default is None or value != str(default)
+
+
+def build_rules(config: Dict[str, Dict[str, Any]]) -> List[Rule]:
+    rules = []
+    for name, options in config.items():
+        method, _, path = name.partition(" ")
+        scope_type = "websocket" if method == "WS" else "http"
+        rule = Rule(
+            name=name,
+            scope_type=scope_type,
+            method=None if scope_type == "websocket" else method,
+            pattern=_compile_path(path),
+            rate=options.get("rate"),
+            burst=options.get("burst", options.get("rate")),
+            message_rate=options.get("message_rate"),
+            message_burst=options.get("message_burst", options.get("message_rate")),
+            exempt_params=_exempt_params(options.get("exempt_params", {})),
+            costly_params=frozenset(options.get("costly_params", ())),
+        )
+        if "concurrency" in options:
+            rule.concurrency = ConcurrencyLimit(
+                int(options["concurrency"]),
+                int(options.get("queue", 0)),
+                options.get("queue_timeout", settings.ADMISSION_QUEUE_TIMEOUT_SECONDS),
+            )
+        rules.append(rule)
+    return rules
+
+
+admission_rejections_total = counter(
+    "admission_rejections_total",
+    "Requests and WebSocket handshakes turned away by admission control",
+    ("rule", "reason"),
+)
+admission_throttled_frames_total = counter(
+    "admission_throttled_frames_total",
+    "WebSocket frames delayed by the per-socket message rate",
+    ("rule",),
+)
+
+# Rules of every middleware instance, for the queue gauge
+_active_rules: List[Rule] = []
+
+gauge(
+    "admission_queue_waiting",
+    "Requests waiting for a concurrency slot",
+    ("rule",),
+    callback=lambda: {
+        (rule.name,): rule.concurrency.waiting
+        for rule in _active_rules
+        if rule.concurrency is not None
+    },
+)
+
+
+def _client_key(scope) -> str:
+    forwarded_for = None
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                subject = token_subject(token)
+                if subject:
+                    return f"user:{subject}"
+        elif name == b"x-forwarded-for":
+            forwarded_for = value.decode("latin-1").split(",")[0].strip()
+    if scope["type"] == "websocket":
+        query = scope.get("query_string", b"").decode("latin-1")
+        match = re.search(r"(?:^|&)token=([^&]+)", query)
+        subject = token_subject(match.group(1)) if match else None
+        if subject:
+            return f"user:{subject}"
+    if forwarded_for and settings.ADMISSION_TRUST_FORWARDED_FOR:
+        return f"addr:{forwarded_for}"
+    client = scope.get("client")
+    return f"addr:{client[0]}" if client else "addr:unknown"
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware enforcing the configured admission rules."""
+
+    def __init__(self, app, rules: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.app = app
+        self.rules = build_rules(settings.ADMISSION_RULES if rules is None else rules)
+        # Idle buckets refill to full, so forgetting them loses nothing
+        self.buckets = TTLCache(
+            ttl=settings.ADMISSION_CLIENT_IDLE_SECONDS,
+            max_entries=settings.ADMISSION_MAX_CLIENTS,
+        )
+        _active_rules.extend(self.rules)
+
+    def _match(self, scope) -> Optional[Rule]:
+        for rule in self.rules:
+            if rule.scope_type != scope["type"]:
+                continue
+            if rule.method is not None and rule.method != scope["method"]:
+                continue
+            if not rule.pattern.match(scope["path"]):
+                continue
+            return rule
+        return None
+
+    @staticmethod
+    def _rate_exempt(scope, rule: Rule) -> bool:
+        """Whether the query narrows the result enough to skip the token bucket."""
+        if not rule.exempt_params:
+            return False
+        query = parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        if any(name in rule.costly_params for name, _ in query):
+            return False
+        return any(
+            name in rule.exempt_params and narrows(value, rule.exempt_params[name])
+            for name, value in query
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        rule = self._match(scope)
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+
+        if rule.rate and not self._rate_exempt(scope, rule):
+            key = (rule.name, _client_key(scope))
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(rule.rate, rule.burst)
+            self.buckets.set(key, bucket)
+            wait = bucket.take()
+            if wait:
+                admission_rejections_total.inc(rule.name, "rate")
+                await self._reject(scope, receive, send, 429, "Too many requests", wait)
+                return
+
+        if rule.concurrency is not None and not await rule.concurrency.acquire():
+            admission_rejections_total.inc(rule.name, "overloaded")
+            await self._reject(
+                scope, receive, send, 503, "Server is busy", settings.ADMISSION_RETRY_AFTER_SECONDS
+            )
+            return
+
+        if scope["type"] == "websocket" and rule.message_rate:
+            receive = self._throttled(receive, rule)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if rule.concurrency is not None:
+                rule.concurrency.release()
+
+    def _throttled(self, receive, rule: Rule):
+        bucket = TokenBucket(rule.message_rate, rule.message_burst)
+
+        async def throttled_receive():
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                delay = bucket.reserve()
+                if delay:
+                    admission_throttled_frames_total.inc(rule.name)
+                    await asyncio.sleep(delay)
+            return message
+
+        return throttled_receive
+
+    async def _reject(self, scope, receive, send, status_code: int, detail: str, retry_after: float):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ]
+        if scope["type"] == "http":
+            await send({"type": "http.response.start", "status": status_code, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        if "websocket.http.response" in scope.get("extensions", {}):
+            await send({"type": "websocket.http.response.start", "status": status_code, "headers": headers})
+            await send({"type": "websocket.http.response.body", "body": body})
+            return
+        # Without denial responses a close before the accept reads as 403
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        await send({"type": "websocket.accept"})
+        await send({"type": "websocket.close", "code": WS_TRY_AGAIN_LATER, "reason": detail})
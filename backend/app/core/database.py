@@ -1,30 +1,334 @@
 from sqlmodel import SQLModel, create_engine, Session
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
+from itertools import cycle
+from typing import Any, Dict, Optional, Tuple
 from .config import settings
+from .metrics import gauge, histogram, counter
+import asyncio
+import hashlib
+import hmac
+import math
+import time
+
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+pool_wait_seconds = histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ("engine",),
+    buckets=POOL_WAIT_BUCKETS,
+)
+pool_timeouts_total = counter(
+    "db_pool_timeouts_total",
+    "Connection checkouts that gave up after the pool timeout",
+    ("engine",),
+)
+
+
+def _instrumented_pool(label: str) -> type:
+    """Return a queue pool class that records checkout wait times as ``label``."""
+
+    class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return super()._do_get()
+            except PoolTimeoutError:
+                pool_timeouts_total.inc(label)
+                raise
+            finally:
+                pool_wait_seconds.observe(time.perf_counter() - started, label)
+
+    return InstrumentedAsyncQueuePool
+
+
+def engine_options(url: str, label: str) -> Dict[str, Any]:
+    """Build ``create_async_engine`` keyword arguments from the database settings."""
+    options = settings.database_options
+    database_url = make_url(url)
+    kwargs: Dict[str, Any] = {"echo": options["echo"], "future": True}
+
+    if database_url.get_backend_name() == "sqlite" and database_url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's static pool
+        return kwargs
+
+    kwargs.update(
+        poolclass=_instrumented_pool(label),
+        pool_size=options["pool_size"],
+        max_overflow=options["max_overflow"],
+        pool_timeout=options["pool_timeout"],
+        pool_recycle=options["pool_recycle"],
+        pool_pre_ping=options["pool_pre_ping"],
+    )
+
+    if database_url.get_driver_name() == "asyncpg":
+        connect_args: Dict[str, Any] = {
+            "prepared_statement_cache_size": options["statement_cache_size"],
+        }
+        if options["statement_timeout_ms"]:
+            connect_args["server_settings"] = {
+                "statement_timeout": str(options["statement_timeout_ms"]),
+            }
+        kwargs["connect_args"] = connect_args
+
+    return kwargs
+
 
 # Async engine for database operations
 async_engine = create_async_engine(
     settings.DATABASE_URL,
-    echo=True,
-    future=True
+    **engine_options(settings.DATABASE_URL, "primary")
 )
 
 # Async session maker
 AsyncSessionLocal = sessionmaker(
-    async_engine, 
-    class_=AsyncSession, 
+    async_engine,
+    class_=AsyncSession,
     expire_on_commit=False
 )
 
+# Read-only replicas; reads fall back to the primary when none are configured
+replica_engines = [
+    create_async_engine(url, **engine_options(url, f"replica{index}"))
+    for index, url in enumerate(settings.DATABASE_REPLICA_URLS)
+]
+
+ReplicaSessionLocals = [
+    sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    for engine in replica_engines
+]
+
+_replica_rotation = cycle(ReplicaSessionLocals) if ReplicaSessionLocals else None
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+def dialect_insert(session: AsyncSession):
+    """Return the dialect-specific ``insert`` supporting ``ON CONFLICT``, if any."""
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+# Clients that wrote recently keep reading from the primary so they see their
+# own writes despite replication lag. The deadline travels with the client, as
+# a cookie and as a header for clients that do not keep cookies, so it holds
+# whichever worker serves the next request.
+PRIMARY_UNTIL_COOKIE = "primary_until"
+PRIMARY_UNTIL_HEADER = "x-primary-until"
+
+
+def _sign(value: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+def primary_until_token(until: float) -> str:
+    """Return a signed token pinning reads to the primary until ``until`` (epoch seconds)."""
+    value = f"{until:.3f}"
+    return f"{value}.{_sign(value)}"
+
+
+def reads_pinned(request: Request) -> bool:
+    """Whether the request carries an unexpired, correctly signed primary-until token."""
+    token = request.headers.get(PRIMARY_UNTIL_HEADER) or request.cookies.get(PRIMARY_UNTIL_COOKIE)
+    if not token:
+        return False
+    value, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature, _sign(value)):
+        return False
+    try:
+        return float(value) > time.time()
+    except ValueError:
+        return False
+
+
+def read_sessionmaker(pinned: bool = False) -> sessionmaker:
+    """Return the session maker a read should use; ``pinned`` reads use the primary."""
+    if _replica_rotation is None or pinned:
+        return AsyncSessionLocal
+    return next(_replica_rotation)
+
+
+async def get_session(request: Request) -> AsyncSession:
+    """Dependency to get database session.
+
+    Safe-method requests get a replica session unless the client wrote within
+    the read-your-writes window; everything else uses the primary.
+    """
+    if request.method in READ_METHODS:
+        session_local = read_sessionmaker(reads_pinned(request))
+    else:
+        session_local = AsyncSessionLocal
+
+    async with session_local() as session:
+        yield session
 
-async def get_session() -> AsyncSession:
-    """Dependency to get database session."""
+
+def get_sessionmaker(request: Request) -> sessionmaker:
+    """Dependency returning the session maker ``get_session`` would pick for the request."""
+    if request.method not in READ_METHODS:
+        return AsyncSessionLocal
+    return read_sessionmaker(reads_pinned(request))
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware handing clients a primary-until token after every successful write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_token(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                seconds = settings.READ_YOUR_WRITES_SECONDS
+                token = primary_until_token(time.time() + seconds)
+                cookie = f"{PRIMARY_UNTIL_COOKIE}={token}; Max-Age={math.ceil(seconds)}; Path=/; HttpOnly; SameSite=Lax"
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PRIMARY_UNTIL_HEADER.encode(), token.encode()),
+                    (b"set-cookie", cookie.encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_token)
+
+
+async def get_primary_session() -> AsyncSession:
+    """Dependency to get a primary database session regardless of method."""
     async with AsyncSessionLocal() as session:
         yield session
 
 
+def engine_pool_stats(engine: AsyncEngine) -> Dict[str, int]:
+    """Return connection counts for an engine's pool, where the pool reports them."""
+    pool = engine.sync_engine.pool
+    stats = {}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        read = getattr(pool, name, None)
+        if read is not None:
+            stats[name] = read()
+    return stats
+
+
+def pool_stats() -> Dict[str, Dict[str, int]]:
+    """Return pool statistics for the primary and every replica engine."""
+    stats = {"primary": engine_pool_stats(async_engine)}
+    for index, engine in enumerate(replica_engines):
+        stats[f"replica{index}"] = engine_pool_stats(engine)
+    return stats
+
+
+def _pool_gauge(name: str):
+    return lambda: {
+        (engine,): stats[name]
+        for engine, stats in pool_stats().items()
+        if name in stats
+    }
+
+
+gauge("db_pool_size", "Configured number of pooled connections", ("engine",), _pool_gauge("size"))
+gauge("db_pool_checked_in", "Idle connections in the pool", ("engine",), _pool_gauge("checkedin"))
+gauge("db_pool_checked_out", "Connections currently checked out", ("engine",), _pool_gauge("checkedout"))
+gauge("db_pool_overflow", "Connections open beyond pool_size (negative while below it)", ("engine",), _pool_gauge("overflow"))
+
+
+async def _ping():
+    async with async_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+_readiness: Dict[str, Any] = {"checked_at": None, "ready": False, "error": None}
+_readiness_lock = asyncio.Lock()
+
+
+async def database_ready() -> Tuple[bool, Optional[str]]:
+    """Check primary connectivity, reusing the result for READINESS_CACHE_SECONDS.
+
+    Concurrent callers share one in-flight check, so probes cannot pile up
+    on the database while it is slow.
+    """
+    async with _readiness_lock:
+        checked_at = _readiness["checked_at"]
+        if checked_at is not None and time.monotonic() - checked_at < settings.READINESS_CACHE_SECONDS:
+            return _readiness["ready"], _readiness["error"]
+
+        try:
+            await asyncio.wait_for(_ping(), timeout=settings.READINESS_TIMEOUT_SECONDS)
+            ready, error = True, None
+        except Exception as e:
+            ready, error = False, str(e) or e.__class__.__name__
+
+        _readiness.update(checked_at=time.monotonic(), ready=ready, error=error)
+        return ready, error
+
+
 async def create_db_and_tables():
-    """Create database tables."""
+    """Create database tables, recording an empty database at the head revision.
+
+    Tables are checked before ``create_all``: a database that already has
+    tables but no ``alembic_version`` predates the migrations, and stamping it
+    at head would skip every migration it still needs.
+    """
+    from .migrations import SchemaOutOfDate, current_revisions, stamp_head
+
     async with async_engine.begin() as conn:
-        await conn.run_sync(SQLModel.metadata.create_all)
\ No newline at end of file
+        versioned = bool(await current_revisions(conn))
+        empty = not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("users"))
+        if not versioned and not empty:
+            raise SchemaOutOfDate(
+                "Database has tables but no Alembic revision; run "
+                "`alembic stamp 0001 && alembic upgrade head`"
+            )
+        await conn.run_sync(SQLModel.metadata.create_all)
+        if not versioned:
+            await stamp_head(conn)
+
+
+async def warm_pool(engine: AsyncEngine, connections: int):
+    """Open ``connections`` pooled connections up front, so first requests skip the connect."""
+    size = engine_pool_stats(engine).get("size")
+    if not size or connections <= 0:
+        return
+    opened = [engine.connect() for _ in range(min(connections, size))]
+    await asyncio.gather(*(conn.start() for conn in opened))
+    await asyncio.gather(*(conn.close() for conn in opened))
+
+
+async def prepare_database():
+    """Get the database ready for serving, per ``settings.schema_startup``.
+
+    The schema step and pool warm-up run concurrently.
+    """
+    mode = settings.schema_startup
+    if mode == "create":
+        schema_step = create_db_and_tables()
+    elif mode == "check":
+        # Alembic is only imported when the check runs
+        from .migrations import check_schema_revision
+        schema_step = check_schema_revision(async_engine)
+    elif mode == "skip":
+        schema_step = asyncio.sleep(0)
+    else:
+        raise ValueError(f"Unknown DATABASE_SCHEMA_STARTUP {mode!r}")
+
+    connections = settings.database_options["pool_warm"]
+    await asyncio.gather(
+        schema_step,
+        warm_pool(async_engine, connections),
+        *(warm_pool(engine, connections) for engine in replica_engines),
+    )
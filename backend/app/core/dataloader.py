@@ -0,0 +1,92 @@
+"""Coalescing of concurrent primary-key lookups.
+
+``DataLoader.load`` does not query right away: lookups for the same model
+arriving in the same event loop tick (from any number of concurrent requests
+or sockets) are collected and fetched together with one
+``SELECT ... WHERE id IN (...)``, and concurrent lookups of the same id share
+one result. Nothing is cached between batches, so every load sees data at
+least as fresh as a direct query started at the same time.
+
+Loaded objects come from a short-lived session of their own and are detached,
+so treat them as read-only snapshots; load into the request's session when
+the row is to be modified.
+"""
+from sqlmodel import select
+from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, Hashable, Optional, Set
+from .config import settings
+from .metrics import histogram
+import asyncio
+
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+dataloader_batch_size = histogram(
+    "dataloader_batch_size",
+    "Ids fetched per coalesced lookup query",
+    ("model",),
+    buckets=BATCH_SIZE_BUCKETS,
+)
+
+Batch = Dict[Hashable, "asyncio.Future[Any]"]
+
+
+class DataLoader:
+    def __init__(self, model, max_batch_size: Optional[int] = None):
+        self.model = model
+        self.max_batch_size = max_batch_size or settings.DATALOADER_MAX_BATCH_SIZE
+        # Batches are per session maker so replica and primary reads stay apart
+        self._pending: Dict[sessionmaker, Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def load(self, key: Hashable, session_local: sessionmaker) -> Optional[Any]:
+        """Return the row with primary key ``key`` or ``None`` if it does not exist."""
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(session_local)
+        if batch is None:
+            batch = self._pending[session_local] = {}
+            loop.call_soon(self._dispatch, session_local, batch)
+
+        future = batch.get(key)
+        if future is None:
+            future = batch[key] = loop.create_future()
+            if len(batch) >= self.max_batch_size:
+                self._dispatch(session_local, batch)
+
+        # A cancelled caller must not cancel the lookup for the others sharing it
+        return await asyncio.shield(future)
+
+    def _dispatch(self, session_local: sessionmaker, batch: Batch):
+        if self._pending.get(session_local) is not batch:
+            # Already dispatched because it filled up
+            return
+        del self._pending[session_local]
+        task = asyncio.get_running_loop().create_task(self._fetch(session_local, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, session_local: sessionmaker, batch: Batch):
+        dataloader_batch_size.observe(len(batch), self.model.__name__)
+        found: Dict[Hashable, Any] = {}
+        error: Optional[BaseException] = None
+        try:
+            async with session_local() as session:
+                statement = select(self.model).where(self.model.id.in_(list(batch)))
+                result = await session.exec(statement)
+                found = {row.id: row for row in result.all()}
+        except Exception as e:
+            error = e
+        except BaseException as e:
+            # Cancelled, e.g. at shutdown
+            error = e
+            raise
+        finally:
+            # Every waiter gets an outcome, whatever ended the fetch
+            for key, future in batch.items():
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(found.get(key))
+                elif isinstance(error, Exception):
+                    future.set_exception(error)
+                else:
+                    future.cancel()
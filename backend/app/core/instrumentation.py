@@ -0,0 +1,255 @@
+"""Per-request instrumentation.
+
+``RequestMetricsMiddleware`` feeds the HTTP request metrics served at
+``/metrics``: latency histograms per route template, in-flight requests and
+error counts.
+
+SQLAlchemy cursor events add every statement's duration to the stats of the
+request being served (tracked in a context variable), and
+``QueryInstrumentationMiddleware`` reports the totals in a ``Server-Timing``
+header, logs slow requests with their statement fingerprints and warns about
+statements repeated often enough to look like N+1 queries.
+
+``query_budget`` collects statements regardless of request context, so tests
+can put a ceiling on the queries a route issues::
+
+    with query_budget(max_queries=3):
+        client.get("/api/v1/bookings/me/bookings", headers=headers)
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from typing import Iterator, List, Optional, Tuple
+from .config import settings
+from .metrics import counter, gauge, histogram
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))+\s*\)")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalize a statement so repeated executions with other values match."""
+    statement = _WHITESPACE.sub(" ", statement).strip()
+    return _IN_LIST.sub("(...)", statement)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0.0
+    fingerprints: Counter = field(default_factory=Counter)
+    durations: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float):
+        key = fingerprint(statement)
+        self.count += 1
+        self.duration += duration
+        self.fingerprints[key] += 1
+        self.durations[key] += duration
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Return fingerprints executed at least ``threshold`` times."""
+        return [(key, count) for key, count in self.fingerprints.most_common() if count >= threshold]
+
+    def slowest(self, limit: int = 5) -> List[Tuple[str, int, float]]:
+        return [
+            (key, self.fingerprints[key], duration)
+            for key, duration in self.durations.most_common(limit)
+        ]
+
+
+http_requests_in_flight = gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+)
+http_request_duration_seconds = histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route"),
+)
+http_requests_total = counter(
+    "http_requests_total",
+    "HTTP responses by route template and status code",
+    ("method", "route", "status"),
+)
+http_request_errors_total = counter(
+    "http_request_errors_total",
+    "HTTP requests that failed with a 5xx response or an unhandled exception",
+    ("method", "route"),
+)
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+_budget_collectors: List[QueryStats] = []
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """Return the statement stats of the request being served, if any."""
+    return _current_stats.get()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    stats = _current_stats.get()
+    if stats is None and not _budget_collectors:
+        return
+    duration = time.perf_counter() - started
+    if stats is not None:
+        stats.record(statement, duration)
+    for collector in _budget_collectors:
+        collector.record(statement, duration)
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get("query_started"):
+        connection.info["query_started"].pop()
+
+
+def route_template(scope) -> str:
+    """Return the path template of the route that served the request.
+
+    Keeps per-route labels bounded, e.g. ``/api/v1/listings/42`` (or
+    ``/api/v1/listings/042``) becomes ``/api/v1/listings/{listing_id}``.
+    Requests no route matched are reported as ``unmatched``.
+    """
+    route = scope.get("route")
+    path_format = getattr(route, "path_format", None)
+    if path_format is None:
+        return "unmatched"
+    # Newer FastAPI versions keep routes of included routers relative to the
+    # router's prefix; the prefix is the part of the path in front of the match
+    path = scope.get("path", "")
+    path_regex = getattr(route, "path_regex", None)
+    if path_regex is None or path_regex.match(path):
+        return path_format
+    for index, char in enumerate(path):
+        if char == "/" and index and path_regex.match(path[index:]):
+            return path[:index] + path_format
+    return path_format
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None) -> Iterator[QueryStats]:
+    """Fail if the block issues more than ``max_queries`` statements.
+
+    With ``max_repeats`` set, also fail when a single statement fingerprint
+    runs more than that many times, which is how N+1 patterns show up.
+    """
+    stats = QueryStats()
+    _budget_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _budget_collectors.remove(stats)
+
+    problems = []
+    if stats.count > max_queries:
+        problems.append(f"{stats.count} statements exceed the budget of {max_queries}")
+    if max_repeats is not None:
+        for key, count in stats.repeated(max_repeats + 1):
+            problems.append(f"{count}x (max {max_repeats}): {key}")
+    if problems:
+        executed = "\n".join(f"  {count}x {key}" for key, count in stats.fingerprints.most_common())
+        raise QueryBudgetExceeded("\n".join(problems) + "\nStatements:\n" + executed)
+
+
+class QueryInstrumentationMiddleware:
+    """ASGI middleware collecting per-request statement counts and DB time."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", '
+                    f"app;dur={total_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            self._report(scope, stats, time.perf_counter() - started)
+
+    def _report(self, scope, stats: QueryStats, elapsed: float):
+        name = f'{scope["method"]} {route_template(scope)}'
+
+        repeated = stats.repeated(settings.N_PLUS_ONE_THRESHOLD)
+        for key, count in repeated:
+            logger.warning("Possible N+1 in %s: %d executions of %s", name, count, key)
+
+        if elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            statements = "; ".join(
+                f"{count}x {duration * 1000:.1f}ms {key}" for key, count, duration in stats.slowest()
+            )
+            logger.warning(
+                "Slow request %s: %.1f ms total, %d queries, %.1f ms in DB. Slowest statements: %s",
+                name, elapsed * 1000, stats.count, stats.duration * 1000, statements,
+            )
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording HTTP latency, status and in-flight metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            method = scope["method"]
+            route = route_template(scope)
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, route)
+            http_requests_total.inc(method, route, str(status_code))
+            if status_code >= 500:
+                http_request_errors_total.inc(method, route)
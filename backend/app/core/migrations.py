@@ -0,0 +1,118 @@
+"""Schema revision checks against the Alembic migration scripts.
+
+Startup compares the revision recorded in ``alembic_version`` with the heads
+of ``alembic/versions`` with a table lookup and one ``SELECT``, instead of
+reflecting every table. A database behind the code fails startup; a database
+ahead of it (a migration applied before this worker was replaced) is only
+logged, since migrations are expected to stay compatible with the previous
+release.
+"""
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from functools import lru_cache
+from typing import FrozenSet
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "alembic.ini")
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "alembic"))
+    return config
+
+
+@lru_cache(maxsize=None)
+def script_directory() -> ScriptDirectory:
+    return ScriptDirectory.from_config(alembic_config())
+
+
+@lru_cache(maxsize=None)
+def head_revisions() -> FrozenSet[str]:
+    return frozenset(script_directory().get_heads())
+
+
+@lru_cache(maxsize=None)
+def known_revisions() -> FrozenSet[str]:
+    return frozenset(revision.revision for revision in script_directory().walk_revisions())
+
+
+async def current_revisions(conn: AsyncConnection) -> FrozenSet[str]:
+    """Return the revisions recorded in the database; empty if it was never migrated."""
+    # Checking first keeps a missing table from aborting a surrounding transaction
+    has_table = await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table("alembic_version"))
+    if not has_table:
+        return frozenset()
+    result = await conn.execute(text("SELECT version_num FROM alembic_version"))
+    return frozenset(row[0] for row in result)
+
+
+async def check_schema_revision(engine: AsyncEngine):
+    """Raise ``SchemaOutOfDate`` unless the database is migrated to the code's heads."""
+    async with engine.connect() as conn:
+        current = await current_revisions(conn)
+
+    heads = head_revisions()
+    if current == heads:
+        return
+
+    if current and not current & known_revisions():
+        logger.warning(
+            "Database schema revision %s is newer than this code (%s)",
+            ", ".join(sorted(current)), ", ".join(sorted(heads)),
+        )
+        return
+
+    raise SchemaOutOfDate(
+        f"Database schema is at {', '.join(sorted(current)) or 'no revision'} but the code "
+        f"expects {', '.join(sorted(heads))}; run `alembic upgrade head`"
+    )
+
+
+async def stamp_head(conn: AsyncConnection):
+    """Record the head revision for a schema just created from the models."""
+
+    def stamp(sync_conn):
+        MigrationContext.configure(sync_conn).stamp(script_directory(), "head")
+
+    await conn.run_sync(stamp)
+
+
+async def upgrade_to_head(conn: AsyncConnection):
+    """Run ``alembic upgrade head`` on ``conn``, from inside the running event loop."""
+
+    def upgrade(sync_conn):
+        config = alembic_config()
+        config.attributes["connection"] = sync_conn
+        command.upgrade(config, "head")
+
+    await conn.run_sync(upgrade)
+
+
+async def drop_everything(conn: AsyncConnection):
+    """Drop every table (and on PostgreSQL every enum type) in the database."""
+
+    def drop(sync_conn):
+        metadata = MetaData()
+        metadata.reflect(sync_conn)
+        if sync_conn.dialect.name != "postgresql":
+            metadata.drop_all(sync_conn)
+            return
+        # CASCADE takes partitions and foreign keys along with their tables
+        for table in metadata.sorted_tables:
+            sync_conn.execute(text(f'DROP TABLE IF EXISTS "{table.name}" CASCADE'))
+        for enum in inspect(sync_conn).get_enums():
+            sync_conn.execute(text(f'DROP TYPE IF EXISTS "{enum["name"]}" CASCADE'))
+
+    await conn.run_sync(drop)
@@ -0,0 +1,100 @@
+"""On-demand sampling profiler for a live worker.
+
+A ``SamplingProfiler`` runs in a daemon thread only while a profile is being
+taken: it periodically captures the event loop thread's Python stack with
+``sys._current_frames()`` and counts identical stacks. Nothing is installed or
+hooked while idle, so a worker that is never profiled pays nothing. Output is
+the collapsed-stack format understood by ``flamegraph.pl`` and speedscope.
+"""
+from collections import Counter
+from typing import Dict, Optional
+import asyncio
+import os
+import sys
+import threading
+
+MIN_INTERVAL = 0.001
+
+
+def _code_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    filename = code.co_filename
+    for path in sys.path:
+        if path and filename.startswith(path):
+            filename = os.path.relpath(filename, path)
+            break
+    return f"{name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = max(interval, MIN_INTERVAL)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ask the sampling thread to finish; it exits within one interval."""
+        self._stop.set()
+
+    async def join(self):
+        """Wait for the sampling thread without blocking the event loop."""
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            labels = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = _code_label(code)
+                labels.append(label)
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        """Return the samples as ``frame;frame;frame count`` lines."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class profile_thread:
+    """Async context manager sampling ``thread_id`` for the duration of the block.
+
+    Only one profile may run per process; a second one raises ``ProfilerBusy``.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.profiler = SamplingProfiler(thread_id, interval)
+
+    async def __aenter__(self) -> SamplingProfiler:
+        if not _profile_lock.acquire(blocking=False):
+            raise ProfilerBusy()
+        self.profiler.start()
+        return self.profiler
+
+    async def __aexit__(self, *exc_info):
+        self.profiler.stop()
+        try:
+            await self.profiler.join()
+        finally:
+            _profile_lock.release()
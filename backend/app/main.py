@@ -1,8 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.admission import AdmissionControlMiddleware
 from app.core.config import settings
-from app.core.database import create_db_and_tables
+from app.core.database import ReadYourWritesMiddleware, database_ready, pool_stats, prepare_database
+from app.core.metrics import REGISTRY
+from app.core.instrumentation import QueryInstrumentationMiddleware, RequestMetricsMiddleware
 from app.api.api import api_router
+from app.services.email_dispatcher import dispatcher
 
 app = FastAPI(
     title="Parkiraj.me API",
@@ -10,6 +15,11 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Shed load before any work is done; added first so rejections still pass
+# through CORS and the metrics middleware
+if settings.ADMISSION_CONTROL_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 # Set up CORS
 app.add_middleware(
     CORSMiddleware,
@@ -17,16 +27,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Primary-Until"],
 )
 
+# Reads go to replicas only when some are configured
+if settings.DATABASE_REPLICA_URLS:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+if settings.SQL_INSTRUMENTATION_ENABLED:
+    app.add_middleware(QueryInstrumentationMiddleware)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
 
 @app.on_event("startup")
 async def on_startup():
-    """Create database tables on startup."""
-    await create_db_and_tables()
+    """Check the schema revision, warm the pools and start background workers."""
+    await prepare_database()
+    if settings.email_enabled:
+        dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Stop background workers."""
+    await dispatcher.stop()
 
 
 @app.get("/")
@@ -38,4 +67,28 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check that verifies database connectivity."""
+    ready, error = await database_ready()
+    if not ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "unavailable", "database": error},
+        )
+    return {"status": "ready"}
+
+
+@app.get("/health/pools")
+async def pool_health():
+    """Connection pool statistics for the primary and replica engines."""
+    return pool_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
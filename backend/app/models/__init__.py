@@ -1,13 +1,19 @@
-from .user import User, UserCreate, UserRead, UserUpdate
+from .user import User, UserCreate, UserRead, UserUpdate, UserSummary
 from .listing import Listing, ListingCreate, ListingRead, ListingUpdate
-from .booking import Booking, BookingCreate, BookingRead, BookingUpdate
-from .message import Message, MessageCreate, MessageRead
+from .booking import Booking, BookingCreate, BookingRead, BookingReadExpanded, BookingUpdate
+from .message import Message, MessageArchive, MessageCreate, MessageRead
 from .invoice import Invoice, InvoiceCreate, InvoiceRead
+from .analytics import ListingMonthlyStats, ListingMonthlyStatsRead
+from .conversation import ConversationState, InboxEntry
+from .notification import EmailOutbox, EmailStatus
 
 __all__ = [
-    "User", "UserCreate", "UserRead", "UserUpdate",
+    "User", "UserCreate", "UserRead", "UserUpdate", "UserSummary",
     "Listing", "ListingCreate", "ListingRead", "ListingUpdate", 
-    "Booking", "BookingCreate", "BookingRead", "BookingUpdate",
-    "Message", "MessageCreate", "MessageRead",
-    "Invoice", "InvoiceCreate", "InvoiceRead"
+    "Booking", "BookingCreate", "BookingRead", "BookingReadExpanded", "BookingUpdate",
+    "Message", "MessageArchive", "MessageCreate", "MessageRead",
+    "Invoice", "InvoiceCreate", "InvoiceRead",
+    "ListingMonthlyStats", "ListingMonthlyStatsRead",
+    "ConversationState", "InboxEntry",
+    "EmailOutbox", "EmailStatus"
 ]
\ No newline at end of file
@@ -0,0 +1,26 @@
+from sqlmodel import SQLModel, Field
+from datetime import date
+from decimal import Decimal
+import uuid
+
+
+class ListingMonthlyStatsBase(SQLModel):
+    listing_id: int
+    month: date
+    request_count: int = Field(default=0)
+    confirmed_count: int = Field(default=0)
+    declined_count: int = Field(default=0)
+    booked_days: int = Field(default=0)
+    revenue: Decimal = Field(default=Decimal("0.00"), max_digits=12, decimal_places=2)
+
+
+class ListingMonthlyStats(ListingMonthlyStatsBase, table=True):
+    __tablename__ = "listing_monthly_stats"
+    
+    listing_id: int = Field(foreign_key="listings.id", primary_key=True)
+    month: date = Field(primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key="users.id", index=True)
+
+
+class ListingMonthlyStatsRead(ListingMonthlyStatsBase):
+    pass
@@ -1,5 +1,8 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Relationship
 from typing import Optional
+from .invoice import Invoice, InvoiceRead
+from .listing import Listing, ListingRead
+from .user import User, UserSummary
 from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
@@ -27,6 +30,13 @@ class Booking(BookingBase, table=True):
     guest_id: uuid.UUID = Field(foreign_key="users.id")
     listing_id: int = Field(foreign_key="listings.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Read-only and never lazy loaded; load with selectinload where needed
+    listing: Optional[Listing] = Relationship(sa_relationship_kwargs={"lazy": "raise", "viewonly": True})
+    guest: Optional[User] = Relationship(sa_relationship_kwargs={"lazy": "raise", "viewonly": True})
+    invoice: Optional[Invoice] = Relationship(
+        sa_relationship_kwargs={"lazy": "raise", "viewonly": True, "uselist": False}
+    )
 
 
 class BookingCreate(BookingBase):
@@ -41,4 +51,15 @@ class BookingRead(BookingBase):
 
 
 class BookingUpdate(SQLModel):
-    status: Optional[BookingStatus] = None
\ No newline at end of file
+    status: Optional[BookingStatus] = None
+
+
+class BookingReadExpanded(BookingRead):
+    """Booking with the related rows requested through ``expand``.
+
+    Relations that were not requested are left out of the response.
+    """
+    listing: Optional[ListingRead] = None
+    guest: Optional[UserSummary] = None
+    owner: Optional[UserSummary] = None
+    invoice: Optional[InvoiceRead] = None
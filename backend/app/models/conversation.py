@@ -0,0 +1,28 @@
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index
+from typing import Optional
+from datetime import datetime
+from .message import MessageRead
+import uuid
+
+
+class ConversationState(SQLModel, table=True):
+    __tablename__ = "conversation_state"
+    __table_args__ = (
+        Index("ix_conversation_state_user_last_message", "user_id", "last_message_at"),
+    )
+    
+    booking_id: int = Field(foreign_key="bookings.id", primary_key=True)
+    user_id: uuid.UUID = Field(foreign_key="users.id", primary_key=True)
+    # Not a foreign key: the partitioned messages table has no unique key on id alone
+    last_message_id: Optional[int] = None
+    last_message_at: Optional[datetime] = None
+    last_read_message_id: Optional[int] = None
+    unread_count: int = Field(default=0)
+
+
+class InboxEntry(SQLModel):
+    booking_id: int
+    unread_count: int
+    last_read_message_id: Optional[int] = None
+    last_message: Optional[MessageRead] = None
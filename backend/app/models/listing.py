@@ -1,6 +1,8 @@
-from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import JSON
-from typing import Optional, List
+from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlalchemy import JSON, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from typing import Optional, List, Dict
+from .user import User
 from datetime import datetime
 from decimal import Decimal
 import uuid
@@ -16,7 +18,8 @@ class ListingBase(SQLModel):
     zip_code: str
     price_per_day: Decimal = Field(max_digits=10, decimal_places=2)
     price_per_hour: Decimal = Field(max_digits=10, decimal_places=2)
-    vehicle_types: List[str] = Field(sa_column=Column(JSON))
+    # JSONB on PostgreSQL so vehicle type filters can use containment and a GIN index
+    vehicle_types: List[str] = Field(sa_column=Column(JSON().with_variant(JSONB(), "postgresql")))
     is_long_term: bool = Field(default=False)
     is_short_term: bool = Field(default=True)
     is_available: bool = Field(default=True)
@@ -24,10 +27,17 @@ class ListingBase(SQLModel):
 
 class Listing(ListingBase, table=True):
     __tablename__ = "listings"
+    __table_args__ = (
+        Index("ix_listings_available_price", "is_available", "price_per_day"),
+        Index("ix_listings_vehicle_types", "vehicle_types", postgresql_using="gin").ddl_if(dialect="postgresql"),
+    )
     
     id: Optional[int] = Field(default=None, primary_key=True)
     owner_id: uuid.UUID = Field(foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Read-only and never lazy loaded; load with selectinload where needed
+    owner: Optional[User] = Relationship(sa_relationship_kwargs={"lazy": "raise", "viewonly": True})
 
 
 class ListingCreate(ListingBase):
@@ -53,4 +63,16 @@ class ListingUpdate(SQLModel):
     vehicle_types: Optional[List[str]] = None
     is_long_term: Optional[bool] = None
     is_short_term: Optional[bool] = None
-    is_available: Optional[bool] = None
\ No newline at end of file
+    is_available: Optional[bool] = None
+
+
+class ListingFacets(SQLModel):
+    city: Optional[Dict[str, int]] = None
+    vehicle_type: Optional[Dict[str, int]] = None
+    price: Optional[Dict[str, int]] = None
+    term: Optional[Dict[str, int]] = None
+
+
+class ListingSearchResult(SQLModel):
+    items: List[ListingRead]
+    facets: ListingFacets
@@ -1,4 +1,5 @@
-from sqlmodel import SQLModel, Field
+from sqlmodel import SQLModel, Field, Column
+from sqlalchemy import Index, LargeBinary
 from typing import Optional
 from datetime import datetime
 import uuid
@@ -10,7 +11,12 @@ class MessageBase(SQLModel):
 
 class Message(MessageBase, table=True):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_booking_sent_at", "booking_id", "sent_at"),
+    )
     
+    # On PostgreSQL the table is range partitioned by month on sent_at and the
+    # primary key is (id, sent_at); see alembic/versions/0003
     id: Optional[int] = Field(default=None, primary_key=True)
     booking_id: int = Field(foreign_key="bookings.id")
     sender_id: uuid.UUID = Field(foreign_key="users.id")
@@ -28,4 +34,16 @@ class MessageRead(MessageBase):
     booking_id: int
     sender_id: uuid.UUID
     receiver_id: uuid.UUID
-    sent_at: datetime
\ No newline at end of file
+    sent_at: datetime
+
+
+class MessageArchive(SQLModel, table=True):
+    __tablename__ = "messages_archive"
+    
+    booking_id: int = Field(foreign_key="bookings.id", primary_key=True)
+    message_count: int
+    first_sent_at: datetime
+    last_sent_at: datetime
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
+    # zlib-compressed JSON list of the conversation's messages, oldest first
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
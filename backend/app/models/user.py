@@ -32,4 +32,11 @@ class UserUpdate(SQLModel):
     email: Optional[str] = None
     first_name: Optional[str] = None
     last_name: Optional[str] = None
-    is_active: Optional[bool] = None
\ No newline at end of file
+    is_active: Optional[bool] = None
+
+
+class UserSummary(SQLModel):
+    """Public name of another user, e.g. the other party of a booking."""
+    id: uuid.UUID
+    first_name: str
+    last_name: str
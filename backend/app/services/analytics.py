@@ -0,0 +1,201 @@
+"""Incrementally maintained per-listing monthly booking rollups.
+
+Every booking contributes to the ``listing_monthly_stats`` rows of the months
+it covers. Routes that create a booking or change its status apply the
+difference between the old and the new contribution in the same transaction,
+so owner analytics never have to scan the bookings table.
+
+Run ``python -m app.services.analytics`` to rebuild the rollups from scratch.
+"""
+from sqlmodel import select, delete
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal, dialect_insert
+from app.models.analytics import ListingMonthlyStats
+from app.models.booking import Booking, BookingStatus
+from app.models.listing import Listing
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Optional, Tuple
+import asyncio
+import uuid
+
+COUNTERS = ("request_count", "confirmed_count", "declined_count", "booked_days", "revenue")
+BOOKED_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.COMPLETED)
+CENT = Decimal("0.01")
+
+StatsKey = Tuple[int, date]
+
+
+def month_start(day: date) -> date:
+    """Return the first day of the month containing ``day``."""
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+def split_days_by_month(start_date: date, end_date: date) -> Dict[date, int]:
+    """Split the booked days of a stay across the months they fall in.
+
+    A stay occupies the days from ``start_date`` up to, but not including,
+    ``end_date``; a same-day booking counts as one day.
+    """
+    if end_date <= start_date:
+        return {month_start(start_date): 1}
+
+    days: Dict[date, int] = {}
+    current = start_date
+    while current < end_date:
+        boundary = min(_next_month(month_start(current)), end_date)
+        days[month_start(current)] = (boundary - current).days
+        current = boundary
+    return days
+
+
+def booking_contribution(
+    booking: Booking,
+    status: Optional[BookingStatus] = None
+) -> Dict[date, Dict[str, object]]:
+    """Return the per-month counters a booking in ``status`` contributes."""
+    status = status or booking.status
+    contribution: Dict[date, Dict[str, object]] = {}
+    request_month = month_start(booking.start_date)
+    contribution[request_month] = {
+        "request_count": 1,
+        "confirmed_count": int(status in BOOKED_STATUSES),
+        "declined_count": int(status == BookingStatus.DECLINED),
+    }
+
+    if status not in BOOKED_STATUSES:
+        return contribution
+
+    days_by_month = split_days_by_month(booking.start_date, booking.end_date)
+    total_days = sum(days_by_month.values())
+    total_price = Decimal(booking.total_price)
+    remaining = total_price
+    months = sorted(days_by_month)
+    for index, month in enumerate(months):
+        if index == len(months) - 1:
+            revenue = remaining
+        else:
+            revenue = (total_price * days_by_month[month] / total_days).quantize(CENT)
+            remaining -= revenue
+        entry = contribution.setdefault(month, {})
+        entry["booked_days"] = days_by_month[month]
+        entry["revenue"] = revenue
+    return contribution
+
+
+def _contribution_delta(
+    booking: Booking,
+    old_status: Optional[BookingStatus],
+    new_status: BookingStatus
+) -> Dict[date, Dict[str, object]]:
+    new = booking_contribution(booking, new_status)
+    old = booking_contribution(booking, old_status) if old_status else {}
+
+    delta: Dict[date, Dict[str, object]] = {}
+    for month in set(new) | set(old):
+        changes = {}
+        for counter in COUNTERS:
+            value = new.get(month, {}).get(counter, 0) - old.get(month, {}).get(counter, 0)
+            if value:
+                changes[counter] = value
+        if changes:
+            delta[month] = changes
+    return delta
+
+
+async def _upsert_increment(
+    session: AsyncSession,
+    listing_id: int,
+    owner_id: uuid.UUID,
+    month: date,
+    changes: Dict[str, object]
+):
+    """Atomically add ``changes`` to a rollup row, creating it if needed."""
+    insert = dialect_insert(session)
+    if insert is not None:
+        table = ListingMonthlyStats.__table__
+        values = {counter: 0 for counter in COUNTERS}
+        values.update(changes)
+        statement = insert(table).values(
+            listing_id=listing_id, month=month, owner_id=owner_id, **values
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.listing_id, table.c.month],
+            set_={counter: table.c[counter] + statement.excluded[counter] for counter in changes},
+        )
+        await session.execute(statement)
+        return
+
+    stats = await session.get(ListingMonthlyStats, (listing_id, month))
+    if stats is None:
+        stats = ListingMonthlyStats(listing_id=listing_id, month=month, owner_id=owner_id)
+    for counter, value in changes.items():
+        setattr(stats, counter, getattr(stats, counter) + value)
+    session.add(stats)
+
+
+async def record_booking_change(
+    session: AsyncSession,
+    booking: Booking,
+    owner_id: uuid.UUID,
+    old_status: Optional[BookingStatus] = None
+):
+    """Apply a booking creation or status change to the rollups.
+
+    Pass ``old_status=None`` for a newly created booking. The caller commits.
+    """
+    delta = _contribution_delta(booking, old_status, booking.status)
+    for month, changes in sorted(delta.items()):
+        await _upsert_increment(session, booking.listing_id, owner_id, month, changes)
+
+
+async def rebuild_listing_stats(session: AsyncSession, batch_size: int = 10000) -> int:
+    """Recompute every rollup row from the bookings table.
+
+    Returns the number of bookings processed.
+    """
+    totals: Dict[StatsKey, Dict[str, object]] = defaultdict(lambda: {c: 0 for c in COUNTERS})
+    owners: Dict[int, uuid.UUID] = {}
+    processed = 0
+
+    statement = (
+        select(Booking, Listing.owner_id)
+        .join(Listing)
+        .execution_options(yield_per=batch_size)
+    )
+    result = await session.stream(statement)
+    async for booking, owner_id in result:
+        owners[booking.listing_id] = owner_id
+        for month, changes in booking_contribution(booking).items():
+            entry = totals[(booking.listing_id, month)]
+            for counter, value in changes.items():
+                entry[counter] += value
+        processed += 1
+
+    await session.execute(delete(ListingMonthlyStats))
+    rows = [
+        ListingMonthlyStats(listing_id=listing_id, month=month, owner_id=owners[listing_id], **counters)
+        for (listing_id, month), counters in totals.items()
+    ]
+    for start in range(0, len(rows), batch_size):
+        session.add_all(rows[start:start + batch_size])
+        await session.flush()
+    await session.commit()
+    return processed
+
+
+async def _main():
+    async with AsyncSessionLocal() as session:
+        processed = await rebuild_listing_stats(session)
+        stats_count = (await session.execute(select(func.count()).select_from(ListingMonthlyStats))).scalar_one()
+    print(f"Rebuilt {stats_count} listing monthly stats rows from {processed} bookings")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
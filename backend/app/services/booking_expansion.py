@@ -0,0 +1,62 @@
+"""Related rows for booking lists (``expand=listing,guest,owner,invoice``).
+
+Each requested relation is loaded with ``selectinload``: one extra
+``SELECT ... WHERE id IN (...)`` per relation for the whole page of bookings,
+so the statement count does not grow with the number of rows. The
+relationships are declared ``lazy="raise"``, so a relation that was not
+loaded fails loudly instead of issuing a query per row.
+"""
+from sqlalchemy.orm import selectinload
+from app.models.booking import Booking, BookingRead, BookingReadExpanded
+from app.models.invoice import InvoiceRead
+from app.models.listing import Listing, ListingRead
+from app.models.user import UserSummary
+from typing import FrozenSet, List, Optional
+
+# "owner" is the listing owner, the other party of the guest's own bookings
+EXPANSIONS = ("listing", "guest", "owner", "invoice")
+
+
+def parse_expand(expand: Optional[str]) -> FrozenSet[str]:
+    """Parse the comma-separated ``expand`` parameter."""
+    if not expand:
+        return frozenset()
+    names = frozenset(name.strip() for name in expand.split(",") if name.strip())
+    unknown = names - set(EXPANSIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown expand {', '.join(sorted(unknown))}; choose from {', '.join(EXPANSIONS)}"
+        )
+    return names
+
+
+def expand_options(names: FrozenSet[str]) -> list:
+    """Loader options fetching the requested relations along with the bookings."""
+    options = []
+    if "owner" in names:
+        options.append(selectinload(Booking.listing).selectinload(Listing.owner))
+    elif "listing" in names:
+        options.append(selectinload(Booking.listing))
+    if "guest" in names:
+        options.append(selectinload(Booking.guest))
+    if "invoice" in names:
+        options.append(selectinload(Booking.invoice))
+    return options
+
+
+def expanded_booking(booking: Booking, names: FrozenSet[str]) -> BookingReadExpanded:
+    """Build the response for one booking whose relations were loaded with ``expand_options``."""
+    data = BookingRead.model_validate(booking).model_dump()
+    if "listing" in names:
+        data["listing"] = ListingRead.model_validate(booking.listing)
+    if "guest" in names:
+        data["guest"] = UserSummary.model_validate(booking.guest)
+    if "owner" in names:
+        data["owner"] = UserSummary.model_validate(booking.listing.owner)
+    if "invoice" in names:
+        data["invoice"] = InvoiceRead.model_validate(booking.invoice) if booking.invoice else None
+    return BookingReadExpanded(**data)
+
+
+def expanded_bookings(bookings: List[Booking], names: FrozenSet[str]) -> List[BookingReadExpanded]:
+    return [expanded_booking(booking, names) for booking in bookings]
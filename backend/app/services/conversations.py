@@ -0,0 +1,146 @@
+"""Per-user conversation state for booking chats.
+
+Each participant of a booking chat has a ``conversation_state`` row holding
+the last message, their last-read marker and an unread counter. The rows are
+updated in the same transaction as the message insert, so the inbox can be
+served without reading message history.
+"""
+from sqlmodel import select, update, or_
+from sqlalchemy import case, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import dialect_insert
+from app.models.conversation import ConversationState
+from app.models.message import Message
+from typing import Optional
+import uuid
+
+
+def _greatest(session: AsyncSession, current, candidate):
+    """SQL expression for the larger of a nullable column and a new value."""
+    largest = func.greatest if session.bind.dialect.name == "postgresql" else func.max
+    return largest(func.coalesce(current, candidate), candidate)
+
+
+async def _upsert_state(
+    session: AsyncSession,
+    booking_id: int,
+    user_id: uuid.UUID,
+    message: Message,
+    is_sender: bool
+):
+    values = {
+        "booking_id": booking_id,
+        "user_id": user_id,
+        "last_message_id": message.id,
+        "last_message_at": message.sent_at,
+        "last_read_message_id": message.id if is_sender else None,
+        "unread_count": 0 if is_sender else 1,
+    }
+
+    insert = dialect_insert(session)
+    if insert is not None:
+        table = ConversationState.__table__
+        statement = insert(table).values(**values)
+        # Concurrent senders commit in any order; markers only move forward.
+        # ids and sent_at can disagree on that order, so the id decides for
+        # both and the pair always names the same message.
+        newer = or_(
+            table.c.last_message_id.is_(None),
+            statement.excluded.last_message_id > table.c.last_message_id,
+        )
+        changes = {
+            "last_message_id": case(
+                (newer, statement.excluded.last_message_id), else_=table.c.last_message_id
+            ),
+            "last_message_at": case(
+                (newer, statement.excluded.last_message_at), else_=table.c.last_message_at
+            ),
+        }
+        if is_sender:
+            # Replying implies the sender has seen everything before it
+            changes["last_read_message_id"] = _greatest(
+                session, table.c.last_read_message_id, statement.excluded.last_read_message_id
+            )
+            changes["unread_count"] = 0
+        else:
+            changes["unread_count"] = table.c.unread_count + 1
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.booking_id, table.c.user_id],
+            set_=changes,
+        )
+        await session.execute(statement)
+        return
+
+    state = await session.get(ConversationState, (booking_id, user_id), populate_existing=True)
+    if state is None:
+        session.add(ConversationState(**values))
+        return
+    if state.last_message_id is None or message.id > state.last_message_id:
+        state.last_message_id = message.id
+        state.last_message_at = message.sent_at
+    if is_sender:
+        state.last_read_message_id = max(state.last_read_message_id or message.id, message.id)
+        state.unread_count = 0
+    else:
+        state.unread_count += 1
+    session.add(state)
+
+
+async def record_message(session: AsyncSession, message: Message):
+    """Update both participants' conversation state for a flushed message.
+
+    The caller commits, so the state changes share the message's transaction.
+    """
+    await _upsert_state(session, message.booking_id, message.sender_id, message, is_sender=True)
+    await _upsert_state(session, message.booking_id, message.receiver_id, message, is_sender=False)
+
+
+async def mark_read(
+    session: AsyncSession,
+    booking_id: int,
+    user_id: uuid.UUID,
+    message_id: int
+) -> Optional[ConversationState]:
+    """Move the user's read marker forward to ``message_id`` and commit.
+
+    Returns the updated state, or ``None`` if the user has no messages in the
+    conversation. Markers never move backwards.
+    """
+    state = await session.get(ConversationState, (booking_id, user_id), populate_existing=True)
+    if state is None:
+        return None
+
+    if state.last_message_id is None or (
+        state.last_read_message_id is not None and message_id <= state.last_read_message_id
+    ):
+        # Nothing left to read (archived conversations have no last message)
+        return state
+
+    message_id = min(message_id, state.last_message_id)
+    if message_id == state.last_message_id:
+        unread_count = 0
+    else:
+        # Only the messages after the marker are scanned, at most the unread ones
+        statement = select(func.count()).select_from(Message).where(
+            Message.booking_id == booking_id,
+            Message.receiver_id == user_id,
+            Message.id > message_id,
+        )
+        unread_count = (await session.execute(statement)).scalar_one()
+
+    # Another socket of the same user may have moved the marker meanwhile
+    await session.execute(
+        update(ConversationState)
+        .where(
+            ConversationState.booking_id == booking_id,
+            ConversationState.user_id == user_id,
+            or_(
+                ConversationState.last_read_message_id.is_(None),
+                ConversationState.last_read_message_id < message_id,
+            ),
+        )
+        .values(last_read_message_id=message_id, unread_count=unread_count)
+    )
+    await session.commit()
+    await session.refresh(state)
+    return state
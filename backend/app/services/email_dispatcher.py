@@ -0,0 +1,251 @@
+"""Background delivery of the email outbox.
+
+The dispatcher claims due outbox rows in batches, sends them concurrently over
+a small pool of reused SMTP connections, paces deliveries with a rate limit
+and reschedules failures with exponential backoff until ``EMAIL_MAX_ATTEMPTS``
+is reached; an email that cannot even be built, such as one with a newline in
+a header, fails at once. Every claimed row is settled whatever happens to the
+others in its batch. Claimed rows are leased by pushing ``next_attempt_at``
+forward, so rows left behind by a crashed worker are picked up again once the
+lease ends.
+"""
+from sqlmodel import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.metrics import counter, gauge
+from app.models.notification import EmailOutbox, EmailStatus
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import List, Optional, Tuple
+import aiosmtplib
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPPool:
+    """A bounded pool of connected, reusable SMTP clients."""
+
+    def __init__(self, size: int):
+        self.size = size
+        # One slot per client in use or idle; a discarded client frees its slot
+        self._slots = asyncio.Semaphore(size)
+        self._idle: List[aiosmtplib.SMTP] = []
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+            start_tls=settings.SMTP_START_TLS,
+            timeout=settings.SMTP_TIMEOUT_SECONDS,
+        )
+
+    async def acquire(self) -> aiosmtplib.SMTP:
+        await self._slots.acquire()
+        if self._idle:
+            return self._idle.pop()
+        return self._new_client()
+
+    def release(self, client: aiosmtplib.SMTP):
+        self._idle.append(client)
+        self._slots.release()
+
+    def discard(self, client: aiosmtplib.SMTP):
+        """Drop a broken client; the next acquire creates a fresh one."""
+        client.close()
+        self._slots.release()
+
+    async def send(self, message: EmailMessage):
+        client = await self.acquire()
+        try:
+            if not client.is_connected:
+                await client.connect()
+            await client.send_message(message)
+        except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError):
+            self.discard(client)
+            raise
+        except Exception:
+            self.release(client)
+            raise
+        except BaseException:
+            # Cancelled mid-conversation; the connection state is unknown
+            self.discard(client)
+            raise
+        self.release(client)
+
+    async def close(self):
+        while self._idle:
+            client = self._idle.pop()
+            try:
+                if client.is_connected:
+                    await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most ``rate`` of them start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _describe(error: Exception) -> str:
+    return str(error) or error.__class__.__name__
+
+
+class EmailDispatcher:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._pool: Optional[SMTPPool] = None
+        self._limiter: Optional[RateLimiter] = None
+        self.sent = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    def start(self):
+        """Start delivering in the background on the running event loop."""
+        if self._task is not None:
+            return
+        self._pool = SMTPPool(settings.EMAIL_POOL_SIZE)
+        self._limiter = RateLimiter(settings.EMAIL_RATE_LIMIT_PER_SECOND)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._pool.close()
+
+    def wake(self):
+        """Deliver newly committed emails now instead of at the next poll."""
+        if self._task is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                delivered = await self.dispatch_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Email dispatch failed")
+                delivered = 0
+
+            if delivered >= settings.EMAIL_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=settings.EMAIL_POLL_INTERVAL_SECONDS
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim_batch(self) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            statement = (
+                select(EmailOutbox)
+                .where(
+                    EmailOutbox.status.in_([EmailStatus.PENDING, EmailStatus.SENDING]),
+                    EmailOutbox.next_attempt_at <= now,
+                )
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(settings.EMAIL_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )
+            emails = (await session.execute(statement)).scalars().all()
+            lease_until = now + timedelta(seconds=settings.EMAIL_SEND_LEASE_SECONDS)
+            for email in emails:
+                email.status = EmailStatus.SENDING
+                email.next_attempt_at = lease_until
+                email.attempts += 1
+                session.add(email)
+            await session.commit()
+            return list(emails)
+
+    async def _deliver(self, email: EmailOutbox) -> Tuple[Optional[str], bool]:
+        """Send one email; return ``(error, permanent)``, with ``error`` ``None`` on success."""
+        try:
+            message = EmailMessage()
+            message["From"] = settings.EMAIL_FROM
+            message["To"] = email.recipient
+            message["Subject"] = email.subject
+            message.set_content(email.body)
+        except (ValueError, TypeError) as e:
+            # e.g. a listing title with a newline in the subject; retrying cannot help
+            return _describe(e), True
+
+        await self._limiter.wait()
+        try:
+            await self._pool.send(message)
+        except (aiosmtplib.SMTPException, OSError) as e:
+            return _describe(e), False
+        except Exception as e:
+            logger.exception("Unexpected error sending email %s", email.id)
+            return _describe(e), False
+        return None, False
+
+    async def dispatch_batch(self) -> int:
+        """Claim and deliver one batch of due emails; returns the batch size."""
+        emails = await self._claim_batch()
+        if not emails:
+            return 0
+
+        # The pool bounds how many deliveries are actually in flight
+        self.in_flight += len(emails)
+        try:
+            outcomes = await asyncio.gather(*(self._deliver(email) for email in emails))
+        finally:
+            self.in_flight -= len(emails)
+
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as session:
+            for email, (error, permanent) in zip(emails, outcomes):
+                if error is None:
+                    email.status = EmailStatus.SENT
+                    email.sent_at = now
+                    email.last_error = None
+                    self.sent += 1
+                elif permanent or email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    email.status = EmailStatus.FAILED
+                    email.last_error = error
+                    self.failed += 1
+                    logger.warning("Giving up on email %s to %s: %s", email.id, email.recipient, error)
+                else:
+                    backoff = settings.EMAIL_RETRY_BACKOFF_SECONDS * 2 ** (email.attempts - 1)
+                    email.status = EmailStatus.PENDING
+                    email.next_attempt_at = now + timedelta(seconds=backoff)
+                    email.last_error = error
+                session.add(email)
+            await session.commit()
+        return len(emails)
+
+
+dispatcher = EmailDispatcher()
+
+counter("email_sent_total", "Emails delivered by this worker's dispatcher", callback=lambda: {(): dispatcher.sent})
+counter("email_failed_total", "Emails given up on by this worker's dispatcher", callback=lambda: {(): dispatcher.failed})
+gauge("email_dispatch_in_flight", "Emails claimed by this worker and not yet settled", callback=lambda: {(): dispatcher.in_flight})
@@ -0,0 +1,278 @@
+"""Listing search filters and facet counts.
+
+Facets are computed for the current filter set in a single statement with one
+grouping set per requested dimension (city, price bucket, each term flag) and
+an empty set that carries the vehicle type counts, so every dimension is
+counted on its own instead of over their cross product. SQLite has no
+``GROUPING SETS``; there the same sets are combined with ``UNION ALL``.
+
+Each facet is counted without its own filter, so the counts show what picking
+another value of that facet would return: with ``vehicle_type=car`` the
+vehicle type counts still cover every type. Filters of requested facets move
+from the ``WHERE`` clause into conditional aggregates for that reason.
+Results are cached for a short time per filter combination.
+"""
+from sqlmodel import select
+from sqlalchemy import Boolean, String, and_, case, cast, func, literal, literal_column, null, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.listing import Listing, ListingFacets
+from dataclasses import dataclass, astuple
+from decimal import Decimal
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import json
+
+FACET_NAMES = ("city", "vehicle_type", "price", "term")
+
+# Vehicle types offered by the search form
+VEHICLE_TYPES = ("car", "suv", "van", "truck", "motorcycle")
+
+# Upper bounds (exclusive) of the price-per-day buckets; the last bucket is open
+PRICE_BUCKET_BOUNDS = (Decimal("5"), Decimal("10"), Decimal("20"), Decimal("50"))
+
+facet_cache = TTLCache(
+    ttl=settings.FACET_CACHE_TTL_SECONDS,
+    max_entries=settings.FACET_CACHE_MAX_ENTRIES,
+)
+
+
+@dataclass(frozen=True)
+class ListingFilters:
+    region: Optional[str] = None
+    min_price: Optional[Decimal] = None
+    max_price: Optional[Decimal] = None
+    vehicle_type: Optional[str] = None
+    long_term: Optional[bool] = None
+    short_term: Optional[bool] = None
+
+    def conditions(self) -> List[Tuple[str, object]]:
+        """Return ``(facet, condition)`` for every set filter, keyed by the facet it narrows."""
+        conditions = []
+
+        if self.region:
+            conditions.append(("city", (
+                (Listing.city.ilike(f"%{self.region}%")) |
+                (Listing.state.ilike(f"%{self.region}%"))
+            )))
+
+        if self.min_price is not None:
+            conditions.append(("price", Listing.price_per_day >= self.min_price))
+
+        if self.max_price is not None:
+            conditions.append(("price", Listing.price_per_day <= self.max_price))
+
+        if self.vehicle_type:
+            conditions.append(("vehicle_type", has_vehicle_type(self.vehicle_type)))
+
+        if self.long_term is not None:
+            conditions.append(("term", Listing.is_long_term == self.long_term))
+
+        if self.short_term is not None:
+            conditions.append(("term", Listing.is_short_term == self.short_term))
+
+        return conditions
+
+    def apply(self, statement, exclude: FrozenSet[str] = frozenset()):
+        """Restrict ``statement`` to available listings matching the filters.
+
+        Filters narrowing a facet in ``exclude`` are left out.
+        """
+        statement = statement.where(Listing.is_available == True)
+        for facet, condition in self.conditions():
+            if facet not in exclude:
+                statement = statement.where(condition)
+        return statement
+
+
+class contains_vehicle_type(FunctionElement):
+    """``vehicle_types @> '["car"]'`` on PostgreSQL, a ``LIKE`` on the JSON text elsewhere."""
+    type = Boolean()
+    inherit_cache = True
+
+
+@compiles(contains_vehicle_type)
+def _compile_contains_like(element, compiler, **kw):
+    column, _, pattern = element.clauses
+    return compiler.process(cast(column, String).like(pattern, escape="\\"), **kw)
+
+
+@compiles(contains_vehicle_type, "postgresql")
+def _compile_contains_jsonb(element, compiler, **kw):
+    column, document, _ = element.clauses
+    return f"{compiler.process(column, **kw)} @> CAST({compiler.process(document, **kw)} AS JSONB)"
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def has_vehicle_type(vehicle_type: str):
+    """Match listings whose ``vehicle_types`` array contains ``vehicle_type``."""
+    # Both forms are bound so the compiled statement can be cached per dialect
+    return contains_vehicle_type(
+        Listing.vehicle_types,
+        literal(json.dumps([vehicle_type]), String),
+        literal(f'%{_escape_like(json.dumps(vehicle_type))}%', String),
+    )
+
+
+def parse_vehicle_type(vehicle_type: Optional[str]) -> Optional[str]:
+    """Validate a ``vehicle_type=`` filter against the types the search form offers."""
+    if vehicle_type is not None and vehicle_type not in VEHICLE_TYPES:
+        raise ValueError(f"Unknown vehicle type {vehicle_type}; choose from {', '.join(VEHICLE_TYPES)}")
+    return vehicle_type
+
+
+def parse_facets(facets: Optional[str]) -> FrozenSet[str]:
+    """Parse a comma-separated ``facets=`` value; ``all`` selects every facet."""
+    if not facets:
+        return frozenset()
+    names = {name.strip() for name in facets.split(",") if name.strip()}
+    if "all" in names:
+        return frozenset(FACET_NAMES)
+    unknown = names - set(FACET_NAMES)
+    if unknown:
+        raise ValueError(f"Unknown facets: {', '.join(sorted(unknown))}")
+    return frozenset(names)
+
+
+def _price_bucket_labels():
+    labels = []
+    lower = Decimal("0")
+    for upper in PRICE_BUCKET_BOUNDS:
+        labels.append(f"{lower}-{upper}")
+        lower = upper
+    labels.append(f"{lower}+")
+    return labels
+
+
+def _price_bucket():
+    # Inline literals keep the expression identical in SELECT and GROUP BY
+    labels = _price_bucket_labels()
+    return case(
+        *[
+            (Listing.price_per_day < literal_column(str(upper)), literal_column(f"'{label}'"))
+            for upper, label in zip(PRICE_BUCKET_BOUNDS, labels)
+        ],
+        else_=literal_column(f"'{labels[-1]}'"),
+    )
+
+
+def _count_matching(conditions):
+    """Aggregate counting the rows of a group that match every condition."""
+    if not conditions:
+        return func.count()
+    return func.sum(case((and_(*conditions), 1), else_=0))
+
+
+def _grouping_sets(names: FrozenSet[str]):
+    """Return ``(facet, columns)`` per grouping set; the empty set has facet ``None``."""
+    sets = []
+    if "city" in names:
+        sets.append(("city", [Listing.city]))
+    if "price" in names:
+        sets.append(("price", [_price_bucket()]))
+    if "term" in names:
+        sets.append(("long_term", [Listing.is_long_term]))
+        sets.append(("short_term", [Listing.is_short_term]))
+    sets.append((None, []))
+    return sets
+
+
+def _facet_statement(filters: ListingFilters, names: FrozenSet[str], sets, dialect_name: str):
+    # Every grouped column gets a key and a grouped flag: 0 where the row is
+    # grouped on it, 1 where it is aggregated away
+    columns = [column for _, set_columns in sets for column in set_columns]
+
+    # Filters of the requested facets are applied per aggregate, each facet's
+    # count leaving out its own
+    deferred = [(facet, condition) for facet, condition in filters.conditions() if facet in names]
+
+    def others(name):
+        return [condition for facet, condition in deferred if facet != name]
+
+    aggregates = [
+        _count_matching(others(facet)).label(f"{facet}_total")
+        for facet in ("city", "price", "term")
+        if facet in names
+    ]
+    if "vehicle_type" in names:
+        aggregates.extend(
+            _count_matching([has_vehicle_type(vehicle_type), *others("vehicle_type")]).label(vehicle_type)
+            for vehicle_type in VEHICLE_TYPES
+        )
+
+    if dialect_name == "postgresql":
+        statement = filters.apply(select(
+            *(column.label(f"key{index}") for index, column in enumerate(columns)),
+            *(func.grouping(column).label(f"grouped{index}") for index, column in enumerate(columns)),
+            *aggregates,
+        ), exclude=names)
+        return statement.group_by(func.grouping_sets(*(tuple_(*set_columns) for _, set_columns in sets)))
+
+    parts = []
+    first = 0
+    for _, set_columns in sets:
+        grouped = range(first, first + len(set_columns))
+        parts.append(filters.apply(select(
+            *((column if index in grouped else null()).label(f"key{index}") for index, column in enumerate(columns)),
+            *(literal(0 if index in grouped else 1).label(f"grouped{index}") for index in range(len(columns))),
+            *aggregates,
+        ), exclude=names).group_by(*set_columns))
+        first += len(set_columns)
+    return union_all(*parts)
+
+
+async def compute_facets(
+    session: AsyncSession,
+    filters: ListingFilters,
+    names: FrozenSet[str]
+) -> ListingFacets:
+    """Count matching listings per requested facet value."""
+    cache_key = (astuple(filters), names)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    sets = _grouping_sets(names)
+    column_count = sum(len(set_columns) for _, set_columns in sets)
+    # The grouped flags identify the set a row belongs to
+    set_by_flags = {}
+    first = 0
+    for facet, set_columns in sets:
+        grouped = range(first, first + len(set_columns))
+        set_by_flags[tuple(0 if index in grouped else 1 for index in range(column_count))] = (facet, first)
+        first += len(set_columns)
+
+    statement = _facet_statement(filters, names, sets, session.bind.dialect.name)
+    result = await session.execute(statement)
+
+    city: Dict[str, int] = {}
+    price = {label: 0 for label in _price_bucket_labels()}
+    term = {"long_term": 0, "short_term": 0}
+    vehicle_type = {name: 0 for name in VEHICLE_TYPES}
+    for row in result.mappings():
+        facet, first = set_by_flags[tuple(row[f"grouped{index}"] for index in range(column_count))]
+        if facet == "city":
+            # None of the city's listings may pass the other facets' filters
+            if row["city_total"]:
+                city[row[f"key{first}"]] = row["city_total"]
+        elif facet == "price":
+            price[row[f"key{first}"]] = row["price_total"] or 0
+        elif facet in term:
+            if row[f"key{first}"]:
+                term[facet] = row["term_total"] or 0
+        elif "vehicle_type" in names:
+            vehicle_type = {name: row[name] or 0 for name in VEHICLE_TYPES}
+
+    facets = ListingFacets(
+        city=dict(sorted(city.items(), key=lambda item: -item[1])) if "city" in names else None,
+        vehicle_type=vehicle_type if "vehicle_type" in names else None,
+        price=price if "price" in names else None,
+        term=term if "term" in names else None,
+    )
+    facet_cache.set(cache_key, facets)
+    return facets
@@ -0,0 +1,9 @@
+"""Shared data loaders coalescing concurrent lookups by id (see app.core.dataloader)."""
+from app.core.dataloader import DataLoader
+from app.models.booking import Booking
+from app.models.listing import Listing
+from app.models.user import User
+
+listing_loader = DataLoader(Listing)
+user_loader = DataLoader(User)
+booking_loader = DataLoader(Booking)
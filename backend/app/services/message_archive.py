@@ -0,0 +1,246 @@
+"""Monthly message partitions and archival of old conversations.
+
+On PostgreSQL ``messages`` is range partitioned by month on ``sent_at``
+(``messages_YYYY_MM``, plus ``messages_default`` for rows outside every
+month). History reads are bounded by the booking's creation time and the end
+of the current month, so they only touch the partitions in between.
+
+``ensure_message_partitions`` creates the partitions for the coming
+``MESSAGE_PARTITIONS_AHEAD`` months and drops past ones that archival has
+emptied. ``archive_conversations`` moves the messages of bookings completed
+more than ``MESSAGE_ARCHIVE_AFTER_DAYS`` ago into ``messages_archive``: one
+row per booking holding the whole conversation as zlib-compressed JSON. Other
+databases keep a single messages table; archival works the same there.
+
+Run ``python -m app.services.message_archive`` daily (e.g. from cron).
+"""
+from sqlmodel import select, delete, update
+from sqlalchemy import exists, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.booking import Booking, BookingStatus
+from app.models.conversation import ConversationState
+from app.models.message import Message, MessageArchive, MessageRead
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+import asyncio
+import json
+import re
+import zlib
+
+PARTITION_NAME = re.compile(r"^messages_(\d{4})_(\d{2})$")
+
+
+def pack_messages(messages: List[MessageRead]) -> bytes:
+    """Serialize messages, oldest first, into an archive payload."""
+    data = [message.model_dump(mode="json") for message in messages]
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 9)
+
+
+def unpack_messages(payload: bytes) -> List[MessageRead]:
+    return [MessageRead.model_validate(row) for row in json.loads(zlib.decompress(payload))]
+
+
+async def conversation_history(session: AsyncSession, booking: Booking) -> List[MessageRead]:
+    """Return a booking's messages, archived ones included, oldest first."""
+    history = []
+    if booking.status == BookingStatus.COMPLETED:
+        archive = await session.get(MessageArchive, booking.id)
+        if archive is not None:
+            history.extend(unpack_messages(archive.payload))
+
+    # No message predates its booking or is sent after this month; the bounds
+    # let PostgreSQL skip the partitions outside them, the default one included
+    statement = select(Message).where(
+        Message.booking_id == booking.id,
+        Message.sent_at >= booking.created_at,
+        Message.sent_at < datetime.combine(_next_month(_month_start(datetime.utcnow().date())), time()),
+    ).order_by(Message.sent_at)
+    result = await session.exec(statement)
+    history.extend(MessageRead.model_validate(message) for message in result.all())
+    return history
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(month: date) -> date:
+    return (month + timedelta(days=32)).replace(day=1)
+
+
+async def _partition_months(session: AsyncSession) -> Dict[date, str]:
+    result = await session.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'messages'"
+    ))
+    months = {}
+    for (name,) in result:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+async def _create_partition(session: AsyncSession, name: str, month: date, following: date):
+    bounds = f"FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+    in_month = f"sent_at >= '{month.isoformat()}' AND sent_at < '{following.isoformat()}'"
+    # Holds off message writes until the commit, so no row for the month can
+    # land in the default partition between the check and the attach. The
+    # parent is locked first, in the order inserts take their locks.
+    await session.execute(text("LOCK TABLE messages IN SHARE ROW EXCLUSIVE MODE"))
+    has_rows = (await session.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM messages_default WHERE {in_month})"
+    ))).scalar()
+    if not has_rows:
+        await session.execute(text(f"CREATE TABLE {name} PARTITION OF messages FOR VALUES {bounds}"))
+        return
+    # PostgreSQL refuses a partition whose rows sit in the default partition;
+    # move them into a standalone table first and attach it afterwards
+    await session.execute(text(f"CREATE TABLE {name} (LIKE messages INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    await session.execute(text(
+        f"WITH moved AS (DELETE FROM messages_default WHERE {in_month} RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ))
+    await session.execute(text(f"ALTER TABLE messages ATTACH PARTITION {name} FOR VALUES {bounds}"))
+
+
+async def ensure_message_partitions(
+    session: AsyncSession,
+    months_ahead: Optional[int] = None,
+    today: Optional[date] = None
+) -> List[str]:
+    """Create upcoming monthly partitions and drop empty past ones before the archive cutoff.
+
+    Returns the names of the partitions created or dropped; does nothing
+    unless ``messages`` is a partitioned PostgreSQL table.
+    """
+    if session.bind.dialect.name != "postgresql":
+        return []
+    # Tables created from the models (DATABASE_SCHEMA_STARTUP=create) are not partitioned
+    is_partitioned = (await session.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid "
+        "WHERE pg_class.relname = 'messages')"
+    ))).scalar()
+    if not is_partitioned:
+        return []
+    months_ahead = settings.MESSAGE_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    today = today or date.today()
+    existing = await _partition_months(session)
+    changed = []
+
+    month = _month_start(today)
+    for _ in range(months_ahead + 1):
+        following = _next_month(month)
+        if month not in existing:
+            name = f"messages_{month:%Y_%m}"
+            await _create_partition(session, name, month, following)
+            changed.append(name)
+        month = following
+
+    # Months that ended before the archive cutoff only hold messages of
+    # bookings that are not completed; once archival empties them they go
+    cutoff = _month_start(today - timedelta(days=settings.MESSAGE_ARCHIVE_AFTER_DAYS))
+    for month, name in sorted(existing.items()):
+        if _next_month(month) > cutoff:
+            break
+        has_rows = (await session.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name})"))).scalar()
+        if not has_rows:
+            await session.execute(text(f"DROP TABLE {name}"))
+            changed.append(name)
+
+    await session.commit()
+    return changed
+
+
+async def _archive_batch(session: AsyncSession, cutoff: date, batch_size: int) -> int:
+    has_messages = exists().where(Message.booking_id == Booking.id)
+    statement = select(Booking.id).where(
+        Booking.status == BookingStatus.COMPLETED,
+        Booking.end_date < cutoff,
+        has_messages,
+    ).order_by(Booking.id).limit(batch_size)
+    booking_ids = (await session.exec(statement)).all()
+    if not booking_ids:
+        return 0
+
+    statement = select(Message).where(
+        Message.booking_id.in_(booking_ids)
+    ).order_by(Message.booking_id, Message.sent_at, Message.id)
+    conversations: Dict[int, List[MessageRead]] = defaultdict(list)
+    for message in (await session.exec(statement)).all():
+        conversations[message.booking_id].append(MessageRead.model_validate(message))
+    message_ids = [message.id for messages in conversations.values() for message in messages]
+
+    # Messages written to an already archived conversation join its archive
+    statement = select(MessageArchive).where(MessageArchive.booking_id.in_(list(conversations)))
+    archives = {archive.booking_id: archive for archive in (await session.exec(statement)).all()}
+    for booking_id, messages in conversations.items():
+        archive = archives.get(booking_id)
+        if archive is None:
+            archive = MessageArchive(booking_id=booking_id)
+        else:
+            messages = unpack_messages(archive.payload) + messages
+        archive.message_count = len(messages)
+        archive.first_sent_at = messages[0].sent_at
+        archive.last_sent_at = messages[-1].sent_at
+        archive.archived_at = datetime.utcnow()
+        archive.payload = pack_messages(messages)
+        session.add(archive)
+
+    # The inbox keeps the conversation's counters but no longer its last message
+    await session.execute(
+        update(ConversationState)
+        .where(ConversationState.booking_id.in_(list(conversations)))
+        .values(last_message_id=None)
+    )
+    # Delete exactly what was archived; a message sent meanwhile waits for the next run
+    for start in range(0, len(message_ids), 1000):
+        await session.execute(delete(Message).where(
+            Message.booking_id.in_(list(conversations)),
+            Message.id.in_(message_ids[start:start + 1000]),
+        ))
+    await session.commit()
+    return len(conversations)
+
+
+async def archive_conversations(
+    session: AsyncSession,
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    today: Optional[date] = None
+) -> int:
+    """Archive the conversations of bookings completed more than ``older_than_days`` ago.
+
+    Each batch of ``batch_size`` bookings is committed on its own, so an
+    interrupted run keeps its progress. Returns the number of conversations
+    archived.
+    """
+    older_than_days = settings.MESSAGE_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.MESSAGE_ARCHIVE_BATCH_SIZE
+    cutoff = (today or date.today()) - timedelta(days=older_than_days)
+
+    archived = 0
+    while True:
+        count = await _archive_batch(session, cutoff, batch_size)
+        if not count:
+            return archived
+        archived += count
+
+
+async def _main():
+    async with AsyncSessionLocal() as session:
+        archived = await archive_conversations(session)
+        changed = await ensure_message_partitions(session)
+    print(f"Archived {archived} conversations")
+    if changed:
+        print(f"Created or dropped partitions: {', '.join(changed)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
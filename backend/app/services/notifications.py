@@ -0,0 +1,69 @@
+"""Booking notification emails.
+
+Notifications are only written to the ``email_outbox`` table here, in the
+caller's transaction; delivery happens later in the background dispatcher so
+routes never wait on SMTP.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.booking import Booking, BookingStatus
+from app.models.listing import Listing
+from app.models.notification import EmailOutbox
+from app.models.user import User
+from typing import Optional
+
+
+def enqueue_email(
+    session: AsyncSession,
+    recipient: str,
+    subject: str,
+    body: str
+) -> Optional[EmailOutbox]:
+    """Add an email to the outbox; the caller commits it with its own changes."""
+    if not settings.email_enabled:
+        return None
+    email = EmailOutbox(recipient=recipient, subject=subject, body=body)
+    session.add(email)
+    return email
+
+
+async def notify_booking_requested(
+    session: AsyncSession,
+    booking: Booking,
+    listing: Listing,
+    guest: User
+):
+    """Tell the listing owner about a new booking request."""
+    if not settings.email_enabled:
+        return
+    owner = await session.get(User, listing.owner_id)
+    enqueue_email(
+        session,
+        owner.email,
+        f"New booking request for {listing.title}",
+        f"Hi {owner.first_name},\n\n"
+        f"{guest.first_name} {guest.last_name} requested to book \"{listing.title}\" "
+        f"from {booking.start_date} to {booking.end_date} for {booking.total_price}.\n\n"
+        "Log in to Parkiraj.me to confirm or decline the request.\n",
+    )
+
+
+async def notify_booking_status_changed(
+    session: AsyncSession,
+    booking: Booking
+):
+    """Tell the guest that the owner confirmed or declined their booking."""
+    if not settings.email_enabled:
+        return
+    if booking.status not in (BookingStatus.CONFIRMED, BookingStatus.DECLINED):
+        return
+    guest = await session.get(User, booking.guest_id)
+    listing = await session.get(Listing, booking.listing_id)
+    enqueue_email(
+        session,
+        guest.email,
+        f"Your booking for {listing.title} was {booking.status.value}",
+        f"Hi {guest.first_name},\n\n"
+        f"Your booking of \"{listing.title}\" from {booking.start_date} to "
+        f"{booking.end_date} was {booking.status.value}.\n",
+    )
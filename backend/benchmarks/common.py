@@ -0,0 +1,21 @@
+"""Helpers shared by the benchmark scripts."""
+import statistics
+from typing import Dict, Sequence
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize_latencies(samples_ms: Sequence[float]) -> Dict[str, float]:
+    """Summarize request latencies given in milliseconds."""
+    if not samples_ms:
+        return {"requests": 0}
+    return {
+        "requests": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 2),
+        "p50_ms": round(percentile(samples_ms, 0.50), 2),
+        "p95_ms": round(percentile(samples_ms, 0.95), 2),
+        "p99_ms": round(percentile(samples_ms, 0.99), 2),
+    }
@@ -0,0 +1,123 @@
+"""Statement counts of the dashboard booking lists with ``expand``.
+
+Seeds a guest and a host with ``--rows`` bookings each (every booking on its
+own listing, with an invoice) at several sizes and requests
+``/bookings/me/bookings`` and ``/bookings/me/rents`` with every combination of
+relations under ``query_budget``. The budget is the same for every size: the
+user lookup, the bookings and one query per expanded relation, with no
+statement repeated. A relation loaded per row fails the run.
+
+    python -m benchmarks.dashboard_queries --rows 10 200
+"""
+import argparse
+import itertools
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+EXPANSIONS = ("listing", "guest", "owner", "invoice")
+
+
+def _configure_environment():
+    database_path = os.path.join(tempfile.mkdtemp(), "dashboard_queries.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database_path}"
+    os.environ["DATABASE_ECHO"] = "false"
+    os.environ["DATABASE_SCHEMA_STARTUP"] = "create"
+    os.environ["EMAIL_NOTIFICATIONS_ENABLED"] = "false"
+    os.environ["ADMISSION_CONTROL_ENABLED"] = "false"
+
+
+async def _seed(rows: int):
+    from app.core.database import AsyncSessionLocal, async_engine, create_db_and_tables
+    from app.models.booking import Booking
+    from app.models.invoice import Invoice
+    from app.models.listing import Listing
+    from app.models.user import User
+    from sqlmodel import SQLModel
+
+    async with async_engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.drop_all)
+    await create_db_and_tables()
+
+    async with AsyncSessionLocal() as session:
+        # Bookings in both directions so both lists have ``rows`` entries
+        guest = User(email="guest@bench.parkiraj.me", first_name="Guest", last_name="User", password="-")
+        host = User(email="host@bench.parkiraj.me", first_name="Host", last_name="User", password="-")
+        others = [
+            User(email=f"other{i}@bench.parkiraj.me", first_name="Other", last_name=str(i), password="-")
+            for i in range(rows)
+        ]
+        session.add_all([guest, host, *others])
+        await session.flush()
+
+        start = date(2026, 1, 1)
+        for i, other in enumerate(others):
+            for owner, booker in ((other, guest), (host, other)):
+                listing = Listing(
+                    title=f"Spot {i}", address=f"Ulica {i}", city="Zagreb", state="Grad Zagreb",
+                    country="Croatia", zip_code="10000", price_per_day=Decimal("20.00"),
+                    price_per_hour=Decimal("2.00"), vehicle_types=["car"], owner_id=owner.id,
+                )
+                session.add(listing)
+                await session.flush()
+                booking = Booking(
+                    listing_id=listing.id, guest_id=booker.id, start_date=start + timedelta(days=i),
+                    end_date=start + timedelta(days=i + 1), total_price=Decimal("20.00"),
+                )
+                session.add(booking)
+                await session.flush()
+                session.add(Invoice(booking_id=booking.id, user_id=booker.id, amount=booking.total_price))
+        await session.commit()
+        return guest.id, host.id
+
+
+def _measure(client, headers, rows: int) -> dict:
+    from app.core.instrumentation import query_budget
+
+    report = {}
+    for size in range(len(EXPANSIONS) + 1):
+        for names in itertools.combinations(EXPANSIONS, size):
+            # User lookup, bookings, then one query per relation (owner rides on listing)
+            budget = 2 + len(set(names) | ({"listing"} if "owner" in names else set()))
+            for path in ("/api/v1/bookings/me/bookings", "/api/v1/bookings/me/rents"):
+                query = f"?expand={','.join(names)}" if names else ""
+                started = time.perf_counter()
+                with query_budget(max_queries=budget, max_repeats=1) as stats:
+                    response = client.get(path + query, headers=headers[path])
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                response.raise_for_status()
+                assert len(response.json()) == rows, response.text
+                report[f"{path.rsplit('/', 1)[1]}{query}"] = {
+                    "statements": stats.count,
+                    "ms": round(elapsed_ms, 2),
+                }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10, 200])
+    args = parser.parse_args()
+
+    _configure_environment()
+    from fastapi.testclient import TestClient
+    from app.core.security import create_access_token
+    from app.main import app
+
+    report = {}
+    with TestClient(app) as client:
+        for rows in args.rows:
+            guest_id, host_id = client.portal.call(_seed, rows)
+            headers = {
+                "/api/v1/bookings/me/bookings": {"Authorization": f"Bearer {create_access_token({'sub': str(guest_id)})}"},
+                "/api/v1/bookings/me/rents": {"Authorization": f"Bearer {create_access_token({'sub': str(host_id)})}"},
+            }
+            report[rows] = _measure(client, headers, rows)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
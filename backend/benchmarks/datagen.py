@@ -0,0 +1,327 @@
+"""Deterministic synthetic data for the benchmarks.
+
+The same ``--seed`` and sizes always produce the same users, listings,
+bookings, messages and conversation state, so runs on different machines or
+commits work on identical data. Rows are streamed into the database in
+batches with executemany inserts, which keeps memory flat even for the
+``large`` size (millions of rows). The listing rollups are rebuilt at the end
+with ``rebuild_listing_stats``.
+
+Every generated user can log in as ``user{N}@bench.parkiraj.me`` with the
+password ``BENCH_PASSWORD``. The target database is wiped first.
+
+    python -m benchmarks.datagen --size medium --database-url sqlite+aiosqlite:///bench.db
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import sys
+import time
+import uuid
+from array import array
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List
+
+SIZES: Dict[str, Dict[str, int]] = {
+    "small": {"users": 10_000, "listings": 2_000, "bookings": 20_000, "messages": 100_000},
+    "medium": {"users": 200_000, "listings": 40_000, "bookings": 400_000, "messages": 2_000_000},
+    "large": {"users": 1_000_000, "listings": 200_000, "bookings": 2_000_000, "messages": 10_000_000},
+}
+
+BENCH_PASSWORD = "benchmark-password"
+
+# Dates are relative to a fixed day, not today, so the data never drifts
+REFERENCE_DATE = date(2025, 1, 1)
+
+# One in five users hosts listings
+HOST_FRACTION = 5
+
+CITIES = ["Zagreb", "Split", "Rijeka", "Osijek", "Zadar", "Pula", "Dubrovnik", "Varaždin"]
+STATES = {"Zagreb": "Grad Zagreb", "Split": "Dalmacija", "Rijeka": "Primorje", "Osijek": "Slavonija",
+          "Zadar": "Dalmacija", "Pula": "Istra", "Dubrovnik": "Dalmacija", "Varaždin": "Zagorje"}
+VEHICLE_TYPES = ["car", "suv", "van", "truck", "motorcycle"]
+FIRST_NAMES = ["Ana", "Ivan", "Marija", "Luka", "Petra", "Marko", "Iva", "Josip", "Lucija", "Tomislav"]
+LAST_NAMES = ["Horvat", "Kovačević", "Babić", "Marić", "Jurić", "Novak", "Knežević", "Vuković"]
+STATUS_WEIGHTS = [("completed", 55), ("confirmed", 20), ("pending", 15), ("declined", 10)]
+
+BATCH_SIZE = 10_000
+
+
+def user_id(seed: int, index: int) -> uuid.UUID:
+    """Return the id of generated user ``index`` without storing every id."""
+    digest = hashlib.md5(f"{seed}:user:{index}".encode()).digest()
+    return uuid.UUID(bytes=digest, version=4)
+
+
+def user_email(index: int) -> str:
+    return f"user{index}@bench.parkiraj.me"
+
+
+def _rng(seed: int, table: str) -> random.Random:
+    # A stream per table, so changing one size leaves the other tables unchanged
+    return random.Random(f"{seed}:{table}")
+
+
+class Dataset:
+    """Row generators for one seed and size; tables must be generated in order."""
+
+    def __init__(self, seed: int, users: int, listings: int, bookings: int, messages: int, password_hash: str):
+        self.seed = seed
+        self.users = users
+        self.listings = listings
+        self.bookings = bookings
+        self.messages = messages
+        self.password_hash = password_hash
+        self.hosts = max(1, users // HOST_FRACTION)
+        self.listing_owner = array("l")
+        self.booking_guest = array("l")
+        self.booking_listing = array("l")
+        self.booking_start = array("l")
+        self.booking_lead_minutes = array("l")
+        self.conversation_state: List[dict] = []
+
+    def user_rows(self) -> Iterator[dict]:
+        rng = _rng(self.seed, "users")
+        for index in range(self.users):
+            yield {
+                "id": user_id(self.seed, index),
+                "email": user_email(index),
+                "first_name": rng.choice(FIRST_NAMES),
+                "last_name": rng.choice(LAST_NAMES),
+                "is_active": rng.random() > 0.01,
+                "password": self.password_hash,
+                "created_at": datetime.combine(REFERENCE_DATE, datetime.min.time())
+                - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)),
+            }
+
+    def listing_rows(self) -> Iterator[dict]:
+        rng = _rng(self.seed, "listings")
+        for listing_id in range(1, self.listings + 1):
+            owner = rng.randrange(self.hosts)
+            self.listing_owner.append(owner)
+            city = rng.choice(CITIES)
+            is_long_term = rng.random() < 0.4
+            yield {
+                "id": listing_id,
+                "title": f"{city} parking {listing_id}",
+                "description": None if rng.random() < 0.3 else f"Spot {listing_id} close to the centre",
+                "address": f"Ulica {rng.randint(1, 300)}",
+                "city": city,
+                "state": STATES[city],
+                "country": "HR",
+                "zip_code": f"{rng.randint(10000, 53000)}",
+                "price_per_day": Decimal(rng.randint(3, 80)),
+                "price_per_hour": Decimal(rng.randint(1, 8)),
+                "vehicle_types": sorted(rng.sample(VEHICLE_TYPES, rng.randint(1, 3))),
+                "is_long_term": is_long_term,
+                "is_short_term": not is_long_term or rng.random() < 0.5,
+                "is_available": rng.random() > 0.1,
+                "owner_id": user_id(self.seed, owner),
+                "created_at": datetime.combine(REFERENCE_DATE, datetime.min.time())
+                - timedelta(minutes=rng.randrange(2 * 365 * 24 * 60)),
+            }
+
+    def booking_rows(self) -> Iterator[dict]:
+        rng = _rng(self.seed, "bookings")
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        weights = [weight for _, weight in STATUS_WEIGHTS]
+        for booking_id in range(1, self.bookings + 1):
+            listing_id = rng.randint(1, self.listings)
+            guest = rng.randrange(self.users)
+            if guest == self.listing_owner[listing_id - 1]:
+                guest = (guest + 1) % self.users
+            status = rng.choices(statuses, weights)[0]
+            # Completed bookings lie in the past, open ones around the reference date
+            offset = -rng.randint(10, 700) if status == "completed" else rng.randint(-30, 90)
+            start_date = REFERENCE_DATE + timedelta(days=offset)
+            days = rng.randint(1, 30)
+            total_price = Decimal(days * rng.randint(3, 80))
+            lead_minutes = rng.randint(60, 30 * 24 * 60)
+            self.booking_guest.append(guest)
+            self.booking_listing.append(listing_id)
+            self.booking_start.append(start_date.toordinal())
+            self.booking_lead_minutes.append(lead_minutes)
+            yield {
+                "id": booking_id,
+                "start_date": start_date,
+                "end_date": start_date + timedelta(days=days),
+                "total_price": total_price,
+                "status": status,
+                "guest_id": user_id(self.seed, guest),
+                "listing_id": listing_id,
+                "created_at": datetime.combine(start_date, datetime.min.time())
+                - timedelta(minutes=lead_minutes),
+            }
+
+    def message_rows(self) -> Iterator[dict]:
+        """Yield messages booking by booking and collect the conversation state."""
+        rng = _rng(self.seed, "messages")
+        average = self.messages / self.bookings if self.bookings else 0
+        message_id = 0
+        for booking_index in range(self.bookings):
+            remaining = self.messages - message_id
+            if remaining <= 0:
+                break
+            count = min(remaining, int(rng.random() * 2 * average + 0.5))
+            if not count:
+                continue
+            booking_id = booking_index + 1
+            guest = user_id(self.seed, self.booking_guest[booking_index])
+            owner = user_id(self.seed, self.listing_owner[self.booking_listing[booking_index] - 1])
+            start = datetime.combine(date.fromordinal(self.booking_start[booking_index]), datetime.min.time())
+            # A conversation cannot begin before its booking was created
+            sent_at = max(
+                start - timedelta(days=rng.randint(1, 20)),
+                start - timedelta(minutes=self.booking_lead_minutes[booking_index]),
+            )
+            unread = 0
+            sender = receiver = None
+            for _ in range(count):
+                message_id += 1
+                sent_at += timedelta(seconds=rng.randint(5, 6 * 3600))
+                previous_sender = sender
+                sender, receiver = (guest, owner) if rng.random() < 0.5 else (owner, guest)
+                unread = unread + 1 if sender == previous_sender else 1
+                yield {
+                    "id": message_id,
+                    "booking_id": booking_id,
+                    "sender_id": sender,
+                    "receiver_id": receiver,
+                    "content": f"Message {message_id} about booking {booking_id}",
+                    "sent_at": sent_at,
+                }
+            # The last sender has read everything, the other side has the trailing run unread
+            state = {"booking_id": booking_id, "last_message_id": message_id, "last_message_at": sent_at}
+            self.conversation_state.append(
+                {**state, "user_id": sender, "last_read_message_id": message_id, "unread_count": 0}
+            )
+            self.conversation_state.append(
+                {**state, "user_id": receiver, "last_read_message_id": message_id - unread or None,
+                 "unread_count": unread}
+            )
+
+    def take_conversation_state(self) -> List[dict]:
+        """Return and forget the state of conversations generated so far."""
+        rows, self.conversation_state = self.conversation_state, []
+        return rows
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _insert(engine, table, rows: Iterable[dict], batch_size: int, after_batch=None) -> int:
+    inserted = 0
+    started = time.perf_counter()
+    for batch in _batches(rows, batch_size):
+        async with engine.begin() as conn:
+            await conn.execute(table.insert(), batch)
+            if after_batch is not None:
+                await after_batch(conn)
+        inserted += len(batch)
+    print(f"  {table.name}: {inserted} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    return inserted
+
+
+async def seed(
+    seed: int,
+    users: int,
+    listings: int,
+    bookings: int,
+    messages: int,
+    batch_size: int = BATCH_SIZE,
+) -> Dict[str, int]:
+    """Recreate the schema on the configured database and fill it."""
+    from sqlalchemy import text
+    from app.core.database import AsyncSessionLocal, async_engine
+    from app.core.migrations import drop_everything, upgrade_to_head
+    from app.core.security import get_password_hash
+    from app.services.analytics import rebuild_listing_stats
+    import app.models as models
+
+    async with async_engine.begin() as conn:
+        await drop_everything(conn)
+    # Migrated like a deployed database, e.g. messages partitioned on PostgreSQL
+    async with async_engine.begin() as conn:
+        await upgrade_to_head(conn)
+
+    dataset = Dataset(seed, users, listings, bookings, messages, get_password_hash(BENCH_PASSWORD))
+    counts = {"conversation_state": 0}
+
+    async def insert_conversation_state(conn):
+        # Conversations whose messages are all inserted, so the state stays bounded
+        rows = dataset.take_conversation_state()
+        if rows:
+            await conn.execute(models.ConversationState.__table__.insert(), rows)
+            counts["conversation_state"] += len(rows)
+
+    counts["users"] = await _insert(async_engine, models.User.__table__, dataset.user_rows(), batch_size)
+    counts["listings"] = await _insert(async_engine, models.Listing.__table__, dataset.listing_rows(), batch_size)
+    counts["bookings"] = await _insert(async_engine, models.Booking.__table__, dataset.booking_rows(), batch_size)
+    counts["messages"] = await _insert(
+        async_engine, models.Message.__table__, dataset.message_rows(), batch_size, insert_conversation_state
+    )
+    async with async_engine.begin() as conn:
+        await insert_conversation_state(conn)
+
+    if async_engine.dialect.name == "postgresql":
+        # Ids were given explicitly, so move the sequences past them
+        async with async_engine.begin() as conn:
+            for table in ("listings", "bookings", "messages"):
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"GREATEST((SELECT MAX(id) FROM {table}), 1))"
+                ))
+
+    async with AsyncSessionLocal() as session:
+        await rebuild_listing_stats(session)
+    return counts
+
+
+def add_size_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--size", choices=SIZES, default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    for table in ("users", "listings", "bookings", "messages"):
+        parser.add_argument(f"--{table}", type=int, default=None, help=f"Override the {table} count of --size")
+
+
+def sizes_from_args(args) -> Dict[str, int]:
+    sizes = dict(SIZES[args.size])
+    for table in sizes:
+        if getattr(args, table) is not None:
+            sizes[table] = getattr(args, table)
+    return sizes
+
+
+def configure_environment(database_url: str):
+    """Point the app settings at the benchmark database; call before importing ``app``."""
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["DATABASE_ECHO"] = "false"
+    os.environ["EMAIL_NOTIFICATIONS_ENABLED"] = "false"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_size_arguments(parser)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    configure_environment(args.database_url)
+    started = time.perf_counter()
+    counts = asyncio.run(seed(args.seed, batch_size=args.batch_size, **sizes_from_args(args)))
+    print(f"Seeded {counts} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Benchmark the email outbox against a local aiosmtpd server.
+
+Measures dispatcher throughput (mails/sec) for a pre-filled outbox and the
+latency of ``POST /bookings/`` with notifications enabled and disabled.
+
+    python -m benchmarks.email_outbox --emails 2000 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _configure_environment(args):
+    database_path = os.path.join(tempfile.mkdtemp(), "email_outbox.db")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database_path}"
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(args.smtp_port or _free_port())
+    os.environ["SMTP_START_TLS"] = "false"
+    os.environ["EMAIL_POOL_SIZE"] = str(args.pool_size)
+    os.environ["EMAIL_BATCH_SIZE"] = str(args.batch_size)
+    os.environ["EMAIL_RATE_LIMIT_PER_SECOND"] = str(args.rate_limit)
+
+
+class CountingHandler:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted for delivery"
+
+
+async def _measure_throughput(emails: int, handler: CountingHandler) -> dict:
+    from app.core.database import AsyncSessionLocal
+    from app.models.notification import EmailOutbox
+    from app.services.email_dispatcher import dispatcher
+
+    async with AsyncSessionLocal() as session:
+        session.add_all(
+            EmailOutbox(recipient=f"user{i}@example.com", subject="Benchmark", body="Hello")
+            for i in range(emails)
+        )
+        await session.commit()
+
+    started = time.perf_counter()
+    dispatcher.start()
+    dispatcher.wake()
+    while dispatcher.sent + dispatcher.failed < emails:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await dispatcher.stop()
+
+    return {
+        "emails": emails,
+        "sent": dispatcher.sent,
+        "failed": dispatcher.failed,
+        "received_by_server": handler.received,
+        "seconds": round(elapsed, 3),
+        "mails_per_second": round(dispatcher.sent / elapsed, 1),
+    }
+
+
+async def _measure_booking_latency(requests: int) -> dict:
+    import httpx
+    from benchmarks.common import summarize_latencies
+    from app.core.config import settings
+    from app.main import app
+    from app.services.email_dispatcher import dispatcher
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {}
+        for email in ("owner@example.com", "guest@example.com"):
+            await client.post("/api/v1/users/", json={
+                "email": email, "first_name": "Bench", "last_name": "User", "password": "benchmark"
+            })
+            token = await client.post("/api/v1/token", data={"username": email, "password": "benchmark"})
+            headers[email] = {"Authorization": f"Bearer {token.json()['access_token']}"}
+
+        listing = await client.post("/api/v1/listings/", headers=headers["owner@example.com"], json={
+            "title": "Benchmark spot", "address": "Ilica 1", "city": "Zagreb", "state": "Grad Zagreb",
+            "country": "HR", "zip_code": "10000", "price_per_day": "10.00", "price_per_hour": "1.00",
+            "vehicle_types": ["car"],
+        })
+        booking = {
+            "listing_id": listing.json()["id"], "start_date": "2026-01-01",
+            "end_date": "2026-01-03", "total_price": "20.00",
+        }
+
+        dispatcher.start()
+        results = {}
+        for enabled in (False, True):
+            settings.EMAIL_NOTIFICATIONS_ENABLED = enabled
+            samples = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.post("/api/v1/bookings/", json=booking, headers=headers["guest@example.com"])
+                samples.append((time.perf_counter() - started) * 1000)
+                response.raise_for_status()
+            results["notifications_on" if enabled else "notifications_off"] = summarize_latencies(samples)
+        await dispatcher.stop()
+    return results
+
+
+async def _main(args):
+    from aiosmtpd.controller import Controller
+    from app.core.database import async_engine, create_db_and_tables
+    import app.main  # noqa: F401  registers every model before create_all
+
+    # Statement logging would dominate the timings
+    async_engine.echo = False
+    await create_db_and_tables()
+
+    handler = CountingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=int(os.environ["SMTP_PORT"]))
+    controller.start()
+    try:
+        report = {
+            "throughput": await _measure_throughput(args.emails, handler),
+            "create_booking_latency": await _measure_booking_latency(args.requests),
+        }
+    finally:
+        controller.stop()
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Mails/sec, 0 for unlimited")
+    parser.add_argument("--smtp-port", type=int, default=None)
+    args = parser.parse_args()
+
+    _configure_environment(args)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
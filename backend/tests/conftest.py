@@ -0,0 +1,83 @@
+"""Shared fixtures: the app against a throwaway SQLite database.
+
+The environment is set before ``app`` is imported, because the settings and
+engines are created at import time.
+"""
+import os
+import tempfile
+import uuid
+
+_database = os.path.join(tempfile.mkdtemp(prefix="parkiraj-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_database}"
+os.environ["ENVIRONMENT"] = "test"
+os.environ["DATABASE_SCHEMA_STARTUP"] = "create"
+os.environ["EMAIL_NOTIFICATIONS_ENABLED"] = "false"
+# Every test client shares one address; tests/test_admission.py builds its own app
+os.environ["ADMISSION_CONTROL_ENABLED"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+LISTING = {
+    "title": "Garage",
+    "address": "Ilica 1",
+    "city": "Zagreb",
+    "state": "GZ",
+    "country": "HR",
+    "zip_code": "10000",
+    "price_per_day": "10.00",
+    "price_per_hour": "1.00",
+    "vehicle_types": ["car"],
+}
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def run(client):
+    """Run a coroutine function on the app's event loop, e.g. ``run(fn, session)``."""
+    return client.portal.call
+
+
+@pytest.fixture
+def make_user(client):
+    """Register a new user and return ``(auth headers, token)``."""
+
+    def make_user():
+        email = f"{uuid.uuid4().hex[:12]}@example.com"
+        response = client.post("/api/v1/users/", json={
+            "email": email, "first_name": "Test", "last_name": "User", "password": "password",
+        })
+        assert response.status_code == 200, response.text
+        response = client.post("/api/v1/token", data={"username": email, "password": "password"})
+        assert response.status_code == 200, response.text
+        token = response.json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}, token
+
+    return make_user
+
+
+@pytest.fixture
+def booking(client, make_user):
+    """A pending booking; returns ``(booking, owner (headers, token), guest (headers, token))``."""
+    owner, guest = make_user(), make_user()
+    listing = client.post("/api/v1/listings/", json=LISTING, headers=owner[0]).json()
+    response = client.post("/api/v1/bookings/", json={
+        "listing_id": listing["id"],
+        "start_date": "2026-01-28",
+        "end_date": "2026-02-03",
+        "total_price": "60.00",
+    }, headers=guest[0])
+    assert response.status_code == 200, response.text
+    return response.json(), owner, guest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,131 @@
+import pytest
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+from starlette.testclient import WebSocketDenialResponse
+
+from app.core.admission import WS_TRY_AGAIN_LATER, AdmissionControlMiddleware, build_rules
+from app.core.config import DEFAULT_ADMISSION_RULES
+
+
+def build_app(rules):
+    app = FastAPI()
+    app.add_middleware(AdmissionControlMiddleware, rules=rules)
+
+    @app.get("/search")
+    async def search():
+        return []
+
+    @app.websocket("/chat/{room}")
+    async def chat(websocket: WebSocket, room: int):
+        await websocket.accept()
+        await websocket.send_text("welcome")
+        await websocket.close()
+
+    return app
+
+
+@pytest.fixture
+def client():
+    return TestClient(build_app({
+        "GET /search": {"rate": 0.001, "burst": 1, "exempt_params": {"city": None, "min_price": 0},
+                       "costly_params": ["facets"]},
+        "WS /chat/{room}": {"rate": 0.001, "burst": 1},
+    }))
+
+
+def test_rate_limited_requests_get_429_with_retry_after(client):
+    assert client.get("/search").status_code == 200
+    response = client.get("/search")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_exempt_params_take_filtered_requests_out_of_the_rate_limit(client):
+    client.get("/search")
+    assert client.get("/search").status_code == 429
+    for _ in range(3):
+        assert client.get("/search?city=Zagreb").status_code == 200
+    assert client.get("/search?min_price=5").status_code == 200
+    # Paging alone does not exempt a scan
+    assert client.get("/search?skip=100").status_code == 429
+    # Nor does a filter on a request that also asks for facet counts
+    assert client.get("/search?city=Zagreb&facets=all").status_code == 429
+
+
+@pytest.mark.parametrize("query", ["min_price=0", "min_price=0.00", "min_price=-1", "city=", "city=%20", "min_price=abc"])
+def test_filters_that_narrow_nothing_do_not_exempt_a_scan(client, query):
+    client.get("/search")
+    assert client.get(f"/search?{query}").status_code == 429
+
+
+def test_default_listing_rule_exempts_only_indexed_filters():
+    rule = DEFAULT_ADMISSION_RULES["GET /api/v1/listings/"]
+    assert rule["exempt_params"] == {"min_price": 0, "max_price": None, "vehicle_type": None}
+    assert rule["costly_params"] == ["facets"]
+
+
+@pytest.mark.anyio
+async def test_filtered_requests_still_wait_for_a_concurrency_slot():
+    async def app(scope, receive, send):
+        raise AssertionError("the shed request reached the app")
+
+    middleware = AdmissionControlMiddleware(app, rules={
+        "GET /search": {"concurrency": 1, "queue": 0, "exempt_params": {"city": None}},
+    })
+    assert await middleware.rules[0].concurrency.acquire()
+    scope = {
+        "type": "http", "method": "GET", "path": "/search", "query_string": b"city=Zagreb",
+        "headers": [], "client": ("10.0.0.1", 1),
+    }
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+
+    assert sent[0]["status"] == 503
+
+
+def test_exempt_params_may_be_listed_without_defaults():
+    [rule] = build_rules({"GET /search": {"exempt_params": ["city"]}})
+    assert rule.exempt_params == {"city": None}
+
+
+def test_rejected_handshake_gets_a_denial_response(client):
+    with client.websocket_connect("/chat/1") as ws:
+        assert ws.receive_text() == "welcome"
+
+    with pytest.raises(WebSocketDenialResponse) as denied:
+        with client.websocket_connect("/chat/1"):
+            pass
+    assert denied.value.status_code == 429
+    assert int(denied.value.headers["retry-after"]) >= 1
+
+
+@pytest.mark.anyio
+async def test_rejected_handshake_without_denial_support_is_closed_with_1013():
+    async def app(scope, receive, send):
+        raise AssertionError("the rejected socket reached the app")
+
+    middleware = AdmissionControlMiddleware(app, rules={
+        "WS /chat/{room}": {"concurrency": 1, "queue": 0},
+    })
+    # Another socket holds the only slot
+    assert await middleware.rules[0].concurrency.acquire()
+    scope = {"type": "websocket", "path": "/chat/1", "headers": [], "client": ("10.0.0.1", 1)}
+    sent = []
+
+    async def receive():
+        return {"type": "websocket.connect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+
+    assert [message["type"] for message in sent] == ["websocket.accept", "websocket.close"]
+    assert sent[1]["code"] == WS_TRY_AGAIN_LATER
@@ -0,0 +1,112 @@
+import sqlite3
+from decimal import Decimal
+
+from sqlmodel import select
+
+from app.api.routes import bookings
+from app.core.database import AsyncSessionLocal, async_engine
+from app.models.analytics import ListingMonthlyStats
+from app.services.analytics import COUNTERS, rebuild_listing_stats
+from tests.conftest import LISTING
+
+
+def analytics(client, headers):
+    response = client.get("/api/v1/users/me/analytics", headers=headers)
+    assert response.status_code == 200, response.text
+    return {
+        row["month"]: {counter: row[counter] for counter in COUNTERS}
+        for row in response.json()
+    }
+
+
+def month(request_count=1, confirmed_count=0, declined_count=0, booked_days=0, revenue="0.00"):
+    return {
+        "request_count": request_count,
+        "confirmed_count": confirmed_count,
+        "declined_count": declined_count,
+        "booked_days": booked_days,
+        "revenue": revenue,
+    }
+
+
+def set_status(client, headers, booking_id, status):
+    return client.patch(f"/api/v1/bookings/{booking_id}", json={"status": status}, headers=headers)
+
+
+def test_booking_lifecycle_updates_the_owner_analytics(client, booking):
+    booking, owner, guest = booking
+    assert analytics(client, owner[0]) == {"2026-01-01": month()}
+
+    assert set_status(client, owner[0], booking["id"], "confirmed").status_code == 200
+    # Six nights from January 28th: four in January, two in February
+    assert analytics(client, owner[0]) == {
+        "2026-01-01": month(confirmed_count=1, booked_days=4, revenue="40.00"),
+        "2026-02-01": month(request_count=0, booked_days=2, revenue="20.00"),
+    }
+
+    assert set_status(client, owner[0], booking["id"], "declined").status_code == 200
+    assert analytics(client, owner[0]) == {
+        "2026-01-01": month(declined_count=1),
+        "2026-02-01": month(request_count=0),
+    }
+    assert analytics(client, guest[0]) == {}
+
+
+def test_concurrent_status_change_conflicts_without_touching_the_rollups(client, booking, monkeypatch):
+    booking, owner, guest = booking
+    before = analytics(client, owner[0])
+    update = bookings.update
+
+    def update_after_a_concurrent_decline(*args, **kwargs):
+        # Another request changes the status between the read and the update
+        with sqlite3.connect(async_engine.url.database) as conn:
+            conn.execute("UPDATE bookings SET status = 'DECLINED' WHERE id = ?", (booking["id"],))
+        return update(*args, **kwargs)
+
+    monkeypatch.setattr(bookings, "update", update_after_a_concurrent_decline)
+    response = set_status(client, owner[0], booking["id"], "confirmed")
+    assert response.status_code == 409
+    assert analytics(client, owner[0]) == before
+
+
+def test_rebuild_matches_the_incremental_rollups(client, run, make_user):
+    owner, guest = make_user(), make_user()
+    listing_ids = []
+    for index, (start_date, end_date, status) in enumerate([
+        ("2026-03-30", "2026-04-02", "confirmed"),
+        ("2026-04-10", "2026-04-10", "confirmed"),
+        ("2026-04-20", "2026-05-20", "declined"),
+        ("2026-05-01", "2026-05-03", None),
+    ]):
+        if index % 2 == 0:
+            listing_ids.append(client.post("/api/v1/listings/", json=LISTING, headers=owner[0]).json()["id"])
+        response = client.post("/api/v1/bookings/", json={
+            "listing_id": listing_ids[-1],
+            "start_date": start_date,
+            "end_date": end_date,
+            "total_price": "33.33",
+        }, headers=guest[0])
+        assert response.status_code == 200, response.text
+        if status:
+            assert set_status(client, owner[0], response.json()["id"], status).status_code == 200
+
+    async def rows():
+        async with AsyncSessionLocal() as session:
+            result = await session.exec(
+                select(ListingMonthlyStats).where(ListingMonthlyStats.listing_id.in_(listing_ids))
+            )
+            # Rows a status change emptied are kept; a rebuild does not create them
+            return {
+                (stats.listing_id, stats.month): tuple(getattr(stats, counter) for counter in COUNTERS)
+                for stats in result.all()
+                if any(getattr(stats, counter) for counter in COUNTERS)
+            }
+
+    async def rebuild():
+        async with AsyncSessionLocal() as session:
+            await rebuild_listing_stats(session, batch_size=2)
+
+    incremental = run(rows)
+    run(rebuild)
+    assert run(rows) == incremental
+    assert sum(row[COUNTERS.index("revenue")] for row in incremental.values()) == Decimal("66.66")
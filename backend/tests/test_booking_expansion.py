@@ -0,0 +1,39 @@
+import pytest
+
+from app.core.instrumentation import query_budget
+from tests.conftest import LISTING
+
+# The current user, the bookings and one query per relation, for any page size
+STATEMENTS = 5
+
+
+def book_listings(client, make_user, count):
+    owner, guest = make_user(), make_user()
+    for _ in range(count):
+        listing = client.post("/api/v1/listings/", json=LISTING, headers=owner[0]).json()
+        response = client.post("/api/v1/bookings/", json={
+            "listing_id": listing["id"],
+            "start_date": "2026-03-01",
+            "end_date": "2026-03-05",
+            "total_price": "40.00",
+        }, headers=guest[0])
+        assert response.status_code == 200, response.text
+    return owner[0], guest[0]
+
+
+@pytest.mark.parametrize("count", [1, 3, 12])
+def test_expanded_bookings_cost_a_fixed_number_of_statements(client, make_user, count):
+    owner, guest = book_listings(client, make_user, count)
+
+    with query_budget(max_queries=STATEMENTS, max_repeats=1) as stats:
+        response = client.get("/api/v1/bookings/me/bookings?expand=listing,owner,invoice", headers=guest)
+    assert response.status_code == 200
+    assert len(response.json()) == count
+    assert stats.count == STATEMENTS
+
+    with query_budget(max_queries=STATEMENTS, max_repeats=1) as stats:
+        response = client.get("/api/v1/bookings/me/rents?expand=listing,guest,invoice", headers=owner)
+    assert response.status_code == 200
+    assert len(response.json()) == count
+    assert all(booking["listing"]["id"] == booking["listing_id"] for booking in response.json())
+    assert stats.count == STATEMENTS
@@ -0,0 +1,103 @@
+import json
+from datetime import timedelta
+
+from app.core.database import AsyncSessionLocal
+from app.models.message import Message
+from app.services.conversations import record_message
+
+
+def chat(client, booking_id, token):
+    return client.websocket_connect(f"/api/v1/ws/chat/{booking_id}?token={token}")
+
+
+def inbox_entry(client, headers, booking_id):
+    inbox = client.get("/api/v1/users/me/inbox", headers=headers).json()
+    return next(entry for entry in inbox if entry["booking_id"] == booking_id)
+
+
+def test_malformed_frames_get_an_error_and_keep_the_socket_open(client, booking):
+    booking, owner, guest = booking
+    with chat(client, booking["id"], guest[1]) as ws:
+        for frame in (
+            "not json",
+            "[1]",
+            json.dumps({"type": "read", "message_id": "abc"}),
+            json.dumps({"type": "read"}),
+            json.dumps({"type": "read", "message_id": True}),
+            json.dumps({"content": ""}),
+        ):
+            ws.send_text(frame)
+            assert json.loads(ws.receive_text())["type"] == "error"
+
+        ws.send_text(json.dumps({"content": "still here"}))
+        assert json.loads(ws.receive_text())["content"] == "still here"
+
+
+def test_read_marker_never_moves_backwards(client, booking):
+    booking, owner, guest = booking
+    with chat(client, booking["id"], guest[1]) as ws:
+        ids = []
+        for index in range(3):
+            ws.send_text(json.dumps({"content": f"message {index}"}))
+            ids.append(json.loads(ws.receive_text())["id"])
+
+    with chat(client, booking["id"], owner[1]) as ws:
+        for _ in ids:
+            ws.receive_text()
+        ws.send_text(json.dumps({"type": "read", "message_id": ids[2]}))
+        assert json.loads(ws.receive_text())["message_id"] == ids[2]
+        ws.send_text(json.dumps({"type": "read", "message_id": ids[0]}))
+        assert json.loads(ws.receive_text())["message_id"] == ids[2]
+
+    entry = inbox_entry(client, owner[0], booking["id"])
+    assert entry["last_read_message_id"] == ids[2]
+    assert entry["unread_count"] == 0
+
+
+def test_late_commit_of_an_older_message_keeps_the_newer_markers(client, run, booking):
+    booking, owner, guest = booking
+    with chat(client, booking["id"], guest[1]) as ws:
+        ws.send_text(json.dumps({"content": "first"}))
+        first = json.loads(ws.receive_text())
+        ws.send_text(json.dumps({"content": "second"}))
+        second = json.loads(ws.receive_text())
+
+    async def replay_first():
+        # What a concurrent sender committing after "second" looks like
+        async with AsyncSessionLocal() as session:
+            message = await session.get(Message, first["id"])
+            await record_message(session, message)
+            await session.commit()
+
+    run(replay_first)
+
+    entry = inbox_entry(client, guest[0], booking["id"])
+    assert entry["last_read_message_id"] == second["id"]
+    assert entry["last_message"]["id"] == second["id"]
+
+
+def test_out_of_order_id_and_sent_at_keep_the_last_message_pair_together(client, run, booking):
+    booking, owner, guest = booking
+    with chat(client, booking["id"], guest[1]) as ws:
+        ws.send_text(json.dumps({"content": "first"}))
+        first = json.loads(ws.receive_text())
+        ws.send_text(json.dumps({"content": "second"}))
+        second = json.loads(ws.receive_text())
+
+    async def replay_first_with_a_later_timestamp():
+        # The lower id was built last: a sender that flushed first but stamped later
+        async with AsyncSessionLocal() as session:
+            later = await session.get(Message, second["id"])
+            message = await session.get(Message, first["id"])
+            message.sent_at = later.sent_at + timedelta(seconds=1)
+            session.add(message)
+            await session.flush()
+            await record_message(session, message)
+            await session.commit()
+
+    run(replay_first_with_a_later_timestamp)
+
+    for headers in (owner[0], guest[0]):
+        entry = inbox_entry(client, headers, booking["id"])
+        assert entry["last_message"] is not None
+        assert entry["last_message"]["id"] == second["id"]
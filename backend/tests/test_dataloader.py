@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from app.core.database import AsyncSessionLocal
+from app.core.dataloader import DataLoader
+from app.core.instrumentation import query_budget
+from app.models.listing import Listing
+from tests.conftest import LISTING
+
+pytestmark = pytest.mark.anyio
+
+
+class HangingSession:
+    async def __aenter__(self):
+        await asyncio.Event().wait()
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class FailingSession:
+    async def __aenter__(self):
+        raise ConnectionError("database is down")
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+async def test_cancelled_fetch_does_not_leave_waiters_hanging():
+    loader = DataLoader(Listing)
+    loads = [asyncio.ensure_future(loader.load(key, HangingSession)) for key in (1, 2)]
+    await asyncio.sleep(0.01)
+
+    for task in list(loader._tasks):
+        task.cancel()
+
+    results = await asyncio.wait_for(asyncio.gather(*loads, return_exceptions=True), 1)
+    assert all(isinstance(result, asyncio.CancelledError) for result in results)
+
+
+async def test_failed_fetch_raises_in_every_waiter():
+    loader = DataLoader(Listing)
+    results = await asyncio.wait_for(asyncio.gather(
+        loader.load(1, FailingSession), loader.load(2, FailingSession), return_exceptions=True
+    ), 1)
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+
+def test_loads_in_one_tick_share_one_query(client, run, make_user):
+    headers, _ = make_user()
+    ids = [client.post("/api/v1/listings/", json=LISTING, headers=headers).json()["id"] for _ in range(3)]
+    keys = [ids[2], ids[0], 10 ** 9, ids[1], ids[0]]
+
+    async def load_together():
+        loader = DataLoader(Listing)
+        return await asyncio.gather(*(loader.load(key, AsyncSessionLocal) for key in keys))
+
+    with query_budget(max_queries=1) as stats:
+        listings = run(load_together)
+
+    [(statement, count)] = stats.fingerprints.items()
+    assert count == 1
+    assert "IN (...)" in statement
+    assert [listing and listing.id for listing in listings] == [ids[2], ids[0], None, ids[1], ids[0]]
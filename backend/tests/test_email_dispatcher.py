@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+import asyncio
+import socket
+
+import aiosmtplib
+import pytest
+from aiosmtpd.controller import Controller
+from sqlmodel import delete, select, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.notification import EmailOutbox, EmailStatus
+from app.services.email_dispatcher import EmailDispatcher, RateLimiter, SMTPPool
+
+pytestmark = pytest.mark.anyio
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def message(index: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.EMAIL_FROM
+    message["To"] = f"guest{index}@example.com"
+    message["Subject"] = f"Booking {index}"
+    message.set_content("Your booking was confirmed.")
+    return message
+
+
+@pytest.fixture
+def smtp_settings(monkeypatch):
+    def configure(port: int):
+        monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(settings, "SMTP_PORT", port)
+        monkeypatch.setattr(settings, "SMTP_START_TLS", False)
+        monkeypatch.setattr(settings, "SMTP_TIMEOUT_SECONDS", 2.0)
+    return configure
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+async def test_sends_reuse_at_most_size_connections(smtp_settings):
+    inbox = Inbox()
+    controller = Controller(inbox, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    try:
+        smtp_settings(controller.port)
+        pool = SMTPPool(2)
+        await asyncio.wait_for(asyncio.gather(*(pool.send(message(i)) for i in range(6))), 10)
+        assert len(inbox.messages) == 6
+        assert len(pool._idle) <= 2
+        await pool.close()
+    finally:
+        controller.stop()
+
+
+async def test_unreachable_server_fails_every_send_without_hanging(smtp_settings):
+    smtp_settings(free_port())
+    pool = SMTPPool(1)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(pool.send(message(i)) for i in range(4)), return_exceptions=True), 10
+    )
+
+    assert all(isinstance(result, (aiosmtplib.SMTPException, OSError)) for result in results)
+    # Every discarded client gave its slot back
+    client = await asyncio.wait_for(pool.acquire(), 1)
+    pool.discard(client)
+
+
+class Rejecting:
+    async def handle_DATA(self, server, session, envelope):
+        return "451 Try again later"
+
+
+@pytest.fixture
+def smtp_server(smtp_settings):
+    """Start an SMTP server with the given handler and point the settings at it."""
+    controllers = []
+
+    def start(handler):
+        controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        controllers.append(controller)
+        smtp_settings(controller.port)
+        return handler
+
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+@pytest.fixture
+def outbox(client, run):
+    """Helpers reading and writing the shared database's outbox, emptied first."""
+
+    async def execute(statement):
+        async with AsyncSessionLocal() as session:
+            await session.execute(statement)
+            await session.commit()
+
+    async def add(emails):
+        async with AsyncSessionLocal() as session:
+            session.add_all(emails)
+            await session.commit()
+
+    async def rows():
+        async with AsyncSessionLocal() as session:
+            result = await session.exec(select(EmailOutbox).order_by(EmailOutbox.id))
+            return result.all()
+
+    class Outbox:
+        def add(self, *emails):
+            run(add, list(emails))
+
+        def rows(self):
+            return run(rows)
+
+        def make_due(self):
+            run(execute, update(EmailOutbox).values(next_attempt_at=datetime.utcnow()))
+
+    run(execute, delete(EmailOutbox))
+    yield Outbox()
+    run(execute, delete(EmailOutbox))
+
+
+def email(index: int, **fields) -> EmailOutbox:
+    fields = {"subject": f"Booking {index}", "body": "Hi", **fields}
+    return EmailOutbox(recipient=f"guest{index}@example.com", **fields)
+
+
+@pytest.fixture
+def email_dispatcher():
+    email_dispatcher = EmailDispatcher()
+    email_dispatcher._pool = SMTPPool(2)
+    email_dispatcher._limiter = RateLimiter(0)
+    return email_dispatcher
+
+
+def test_claimed_emails_are_leased_until_the_lease_ends(run, outbox, email_dispatcher):
+    now = datetime.utcnow()
+    outbox.add(
+        email(1),
+        email(2),
+        # Claimed by a worker that died; its lease is over
+        email(3, status=EmailStatus.SENDING, attempts=1, next_attempt_at=now - timedelta(seconds=1)),
+        email(4, next_attempt_at=now + timedelta(hours=1)),
+    )
+
+    claimed = run(email_dispatcher._claim_batch)
+    assert sorted(claimed_email.recipient for claimed_email in claimed) == [
+        "guest1@example.com", "guest2@example.com", "guest3@example.com",
+    ]
+    assert run(email_dispatcher._claim_batch) == []
+
+    lease_until = now + timedelta(seconds=settings.EMAIL_SEND_LEASE_SECONDS)
+    rows = outbox.rows()
+    assert [row.status for row in rows] == [EmailStatus.SENDING] * 3 + [EmailStatus.PENDING]
+    assert [row.attempts for row in rows] == [1, 1, 2, 0]
+    assert all(row.next_attempt_at >= lease_until for row in rows[:3])
+
+
+def test_delivered_emails_are_marked_sent(run, outbox, email_dispatcher, smtp_server):
+    inbox = smtp_server(Inbox())
+    outbox.add(email(1), email(2), email(3))
+
+    assert run(email_dispatcher.dispatch_batch) == 3
+    run(email_dispatcher._pool.close)
+
+    assert sorted(envelope.rcpt_tos[0] for envelope in inbox.messages) == [
+        "guest1@example.com", "guest2@example.com", "guest3@example.com",
+    ]
+    assert all(row.status == EmailStatus.SENT and row.sent_at for row in outbox.rows())
+    assert email_dispatcher.sent == 3
+
+
+def test_failures_back_off_and_give_up_after_max_attempts(run, outbox, email_dispatcher, smtp_server, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_BACKOFF_SECONDS", 30.0)
+    smtp_server(Rejecting())
+    outbox.add(email(1))
+
+    for attempt, backoff in ((1, 30), (2, 60)):
+        started = datetime.utcnow()
+        assert run(email_dispatcher.dispatch_batch) == 1
+        [row] = outbox.rows()
+        assert row.status == EmailStatus.PENDING
+        assert row.attempts == attempt
+        assert "Try again later" in row.last_error
+        assert started + timedelta(seconds=backoff) <= row.next_attempt_at
+        assert row.next_attempt_at <= datetime.utcnow() + timedelta(seconds=backoff)
+        # Not due again until the backoff passes
+        assert run(email_dispatcher.dispatch_batch) == 0
+        outbox.make_due()
+
+    assert run(email_dispatcher.dispatch_batch) == 1
+    [row] = outbox.rows()
+    assert row.status == EmailStatus.FAILED
+    assert row.attempts == 3
+    assert email_dispatcher.failed == 1
+    assert run(email_dispatcher.dispatch_batch) == 0
+    run(email_dispatcher._pool.close)
+
+
+def test_malformed_email_fails_alone_without_holding_up_its_batch(run, outbox, email_dispatcher, smtp_server):
+    inbox = smtp_server(Inbox())
+    outbox.add(email(1, subject="New booking request for Garage\nBcc: everyone@example.com"), email(2))
+
+    assert run(email_dispatcher.dispatch_batch) == 2
+    run(email_dispatcher._pool.close)
+
+    malformed, sent = outbox.rows()
+    assert malformed.status == EmailStatus.FAILED
+    assert malformed.attempts == 1
+    assert malformed.last_error
+    assert sent.status == EmailStatus.SENT
+    assert [envelope.rcpt_tos for envelope in inbox.messages] == [["guest2@example.com"]]
@@ -0,0 +1,63 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.instrumentation import QueryBudgetExceeded, query_budget, route_template
+from tests.conftest import LISTING
+
+
+@pytest.fixture(scope="module")
+def templated():
+    app = FastAPI()
+
+    @app.get("/listings/{listing_id}")
+    async def listing(listing_id: int, request: Request):
+        return {"route": route_template(request.scope)}
+
+    @app.get("/users/{user_id}/listings/{listing_id}")
+    async def user_listing(user_id: str, listing_id: int, request: Request):
+        return {"route": route_template(request.scope)}
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/listings/42", "/listings/042", "/listings/+5"])
+def test_route_template_ignores_how_the_id_was_written(templated, path):
+    assert templated.get(path).json() == {"route": "/listings/{listing_id}"}
+
+
+def test_route_template_keeps_repeated_values_apart(templated):
+    # Both parameters are "7"; each keeps its own name
+    response = templated.get("/users/7/listings/7")
+    assert response.json() == {"route": "/users/{user_id}/listings/{listing_id}"}
+
+
+def test_route_template_of_an_unmatched_request():
+    assert route_template({"type": "http", "path": "/nowhere"}) == "unmatched"
+
+
+def test_query_budget_counts_the_statements_of_a_request(client, make_user):
+    headers, _ = make_user()
+    listing = client.post("/api/v1/listings/", json=LISTING, headers=headers).json()
+
+    with query_budget(max_queries=5, max_repeats=1) as stats:
+        assert client.get(f"/api/v1/listings/{listing['id']}").status_code == 200
+    assert 1 <= stats.count <= 5
+
+
+def test_query_budget_fails_when_exceeded(client, make_user):
+    headers, _ = make_user()
+    client.post("/api/v1/listings/", json=LISTING, headers=headers)
+
+    with pytest.raises(QueryBudgetExceeded, match="exceed the budget of 0"):
+        with query_budget(max_queries=0):
+            client.get("/api/v1/users/me/listings/", headers=headers)
+
+
+@pytest.mark.parametrize("listing_id", ["042", "+5", "007"])
+def test_metrics_label_non_canonical_ids_with_the_template(client, listing_id):
+    client.get(f"/api/v1/listings/{listing_id}")
+
+    metrics = client.get("/metrics").text
+    assert 'route="/api/v1/listings/{listing_id}"' in metrics
+    assert f"/api/v1/listings/{listing_id}" not in metrics
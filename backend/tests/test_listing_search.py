@@ -0,0 +1,108 @@
+import uuid
+
+import pytest
+
+from app.core import cache
+from app.core.cache import TTLCache
+from app.services.listing_search import facet_cache
+from tests.conftest import LISTING
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def add_listing(client, headers, **fields):
+    response = client.post("/api/v1/listings/", json={**LISTING, **fields}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+@pytest.fixture
+def region(client, make_user):
+    """Three listings in a region of their own; returns the region name."""
+    headers, _ = make_user()
+    region = uuid.uuid4().hex[:8]
+    add_listing(client, headers, city=f"{region}-a", state=region, price_per_day="4.00",
+                vehicle_types=["car"], is_long_term=True, is_short_term=False)
+    add_listing(client, headers, city=f"{region}-a", state=region, price_per_day="15.00",
+                vehicle_types=["car", "suv"])
+    add_listing(client, headers, city=f"{region}-b", state=region, price_per_day="60.00",
+                vehicle_types=["motorcycle"])
+    return region
+
+
+def test_each_facet_is_counted_without_its_own_filter(client, region):
+    response = client.get(f"/api/v1/listings/?region={region}&vehicle_type=car&facets=all")
+    assert response.status_code == 200, response.text
+    body = response.json()
+    facets = body["facets"]
+
+    assert len(body["items"]) == 2
+    # Every vehicle type in the region, not only cars
+    assert facets["vehicle_type"] == {"car": 2, "suv": 1, "van": 0, "truck": 0, "motorcycle": 1}
+    # Cars in any region: the motorcycle-only city drops out
+    assert facets["city"][f"{region}-a"] == 2
+    assert f"{region}-b" not in facets["city"]
+    # The other facets keep both filters
+    assert facets["price"] == {"0-5": 1, "5-10": 0, "10-20": 1, "20-50": 0, "50+": 0}
+    assert facets["term"] == {"long_term": 1, "short_term": 1}
+
+
+def test_price_and_term_filters_leave_their_own_facets_whole(client, region):
+    response = client.get(f"/api/v1/listings/?region={region}&min_price=10&short_term=true&facets=price,term")
+    facets = response.json()["facets"]
+
+    assert len(response.json()["items"]) == 2
+    # The long-term only listing under 5 fails the term filter; the price filter is ignored
+    assert facets["price"] == {"0-5": 0, "5-10": 0, "10-20": 1, "20-50": 0, "50+": 1}
+    assert facets["term"] == {"long_term": 0, "short_term": 2}
+    assert facets["city"] is None
+
+
+def test_facets_are_served_from_the_cache_until_they_expire(client, make_user, clock):
+    headers, _ = make_user()
+    region = uuid.uuid4().hex[:8]
+    add_listing(client, headers, city=region, state=region)
+    url = f"/api/v1/listings/?region={region}&facets=vehicle_type"
+
+    assert client.get(url).json()["facets"]["vehicle_type"]["car"] == 1
+    add_listing(client, headers, city=region, state=region)
+    assert client.get(url).json()["facets"]["vehicle_type"]["car"] == 1
+
+    clock.now += facet_cache.ttl
+    assert client.get(url).json()["facets"]["vehicle_type"]["car"] == 2
+
+
+def test_ttl_cache_expires_and_evicts_the_least_recently_used(clock):
+    ttl_cache = TTLCache(ttl=10, max_entries=2)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    assert ttl_cache.get("a") == 1
+
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1
+
+    clock.now += 9.9
+    assert ttl_cache.get("c") == 3
+    clock.now += 0.1
+    assert ttl_cache.get("c") is None
+    assert len(ttl_cache) == 1
+
+
+def test_unknown_vehicle_type_is_rejected(client):
+    response = client.get("/api/v1/listings/?vehicle_type=hovercraft&facets=all")
+    assert response.status_code == 400
+    assert "hovercraft" in response.json()["detail"]
@@ -0,0 +1,114 @@
+"""Monthly message partitions against a real PostgreSQL database.
+
+Skipped unless ``TEST_POSTGRES_URL`` points at a database the tests may wipe,
+e.g. ``postgresql+asyncpg://postgres@localhost/parkiraj_test``.
+"""
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.migrations import drop_everything, upgrade_to_head
+from app.models.booking import Booking, BookingStatus
+from app.models.listing import Listing
+from app.models.message import Message
+from app.models.user import User
+from app.services.message_archive import archive_conversations, conversation_history, ensure_message_partitions
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL")
+
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL is not set"),
+]
+
+
+@pytest.fixture
+async def session():
+    engine = create_async_engine(POSTGRES_URL)
+    async with engine.begin() as conn:
+        await drop_everything(conn)
+    async with engine.begin() as conn:
+        await upgrade_to_head(conn)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def make_booking(session, status=BookingStatus.CONFIRMED, end_date=None):
+    owner = User(email=f"{uuid.uuid4()}@example.com", first_name="O", last_name="W", password="x")
+    guest = User(email=f"{uuid.uuid4()}@example.com", first_name="G", last_name="U", password="x")
+    session.add_all([owner, guest])
+    await session.flush()
+    listing = Listing(
+        title="Garage", address="Ilica 1", city="Zagreb", state="GZ", country="HR", zip_code="10000",
+        price_per_day=Decimal("10.00"), price_per_hour=Decimal("1.00"), vehicle_types=["car"],
+        owner_id=owner.id,
+    )
+    session.add(listing)
+    await session.flush()
+    end_date = end_date or date.today()
+    booking = Booking(
+        start_date=end_date - timedelta(days=1), end_date=end_date, total_price=Decimal("10.00"),
+        status=status, guest_id=guest.id, listing_id=listing.id, created_at=datetime(2000, 1, 1),
+    )
+    session.add(booking)
+    await session.commit()
+    return booking
+
+
+async def partition_of(session, message_id: int) -> str:
+    result = await session.execute(
+        text("SELECT tableoid::regclass::text FROM messages WHERE id = :id"), {"id": message_id}
+    )
+    return result.scalar_one()
+
+
+async def test_new_partition_takes_its_rows_from_the_default_partition(session):
+    booking = await make_booking(session)
+    today = date.today()
+    far_ahead = datetime.combine(today.replace(day=1) + timedelta(days=200), datetime.min.time())
+    message = Message(
+        content="See you then", booking_id=booking.id, sent_at=far_ahead,
+        sender_id=booking.guest_id, receiver_id=booking.guest_id,
+    )
+    session.add(message)
+    await session.commit()
+    assert await partition_of(session, message.id) == "messages_default"
+
+    changed = await ensure_message_partitions(session, months_ahead=8, today=today)
+
+    name = f"messages_{far_ahead:%Y_%m}"
+    assert name in changed
+    assert await partition_of(session, message.id) == name
+    result = await session.execute(text("SELECT count(*) FROM messages_default"))
+    assert result.scalar_one() == 0
+    # Attached like any other partition: the primary key still holds across it
+    result = await session.execute(text(
+        "SELECT count(*) FROM pg_indexes WHERE tablename = :name AND indexdef LIKE 'CREATE UNIQUE%'"
+    ), {"name": name})
+    assert result.scalar_one() == 1
+
+
+async def test_history_includes_archived_and_live_messages(session):
+    ended = date.today() - timedelta(days=400)
+    booking = await make_booking(session, status=BookingStatus.COMPLETED, end_date=ended)
+    old = Message(
+        content="Thanks!", booking_id=booking.id, sent_at=datetime.combine(ended, datetime.min.time()),
+        sender_id=booking.guest_id, receiver_id=booking.guest_id,
+    )
+    session.add(old)
+    await session.commit()
+    assert await archive_conversations(session, older_than_days=30) == 1
+
+    recent = Message(content="One more thing", booking_id=booking.id, sender_id=booking.guest_id, receiver_id=booking.guest_id)
+    session.add(recent)
+    await session.commit()
+
+    history = await conversation_history(session, booking)
+    assert [message.content for message in history] == ["Thanks!", "One more thing"]
@@ -0,0 +1,92 @@
+import json
+import re
+
+import pytest
+
+from app.api.routes import websocket
+from app.core import database
+from app.core.config import settings
+
+
+def metric(client, name, labels=""):
+    """Return the value of one sample scraped from ``/metrics``."""
+    text = client.get("/metrics").text
+    match = re.search(rf"^{re.escape(name + labels)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name}{labels} not exported"
+    return float(match.group(1))
+
+
+def test_pool_gauges_report_the_primary_engine(client):
+    labels = '{engine="primary"}'
+    assert metric(client, "db_pool_size", labels) == settings.database_options["pool_size"]
+    # Serving /metrics itself holds no connection
+    assert metric(client, "db_pool_checked_out", labels) == 0
+    assert metric(client, "db_pool_checked_in", labels) >= 1
+
+
+def test_connection_gauge_follows_open_sockets(client, booking):
+    booking, owner, guest = booking
+    before = metric(client, "websocket_connections_active")
+
+    with client.websocket_connect(f"/api/v1/ws/chat/{booking['id']}?token={guest[1]}"):
+        with client.websocket_connect(f"/api/v1/ws/chat/{booking['id']}?token={owner[1]}"):
+            assert metric(client, "websocket_connections_active") == before + 2
+        assert metric(client, "websocket_connections_active") == before + 1
+
+    assert metric(client, "websocket_connections_active") == before
+
+
+def test_errored_socket_leaves_the_connection_gauge(client, booking, monkeypatch):
+    booking, owner, guest = booking
+    before = metric(client, "websocket_connections_active")
+
+    async def broken_mark_read(*args):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(websocket, "mark_read", broken_mark_read)
+    with client.websocket_connect(f"/api/v1/ws/chat/{booking['id']}?token={guest[1]}") as ws:
+        ws.send_text(json.dumps({"type": "read", "message_id": 1}))
+        assert ws.receive()["code"] == 1011
+
+    assert metric(client, "websocket_connections_active") == before
+
+
+@pytest.fixture
+def pings(monkeypatch):
+    """Count database pings; ``pings.error`` makes them fail."""
+
+    class Pings:
+        count = 0
+        error = None
+
+    async def ping():
+        Pings.count += 1
+        if Pings.error:
+            raise Pings.error
+
+    monkeypatch.setattr(database, "_ping", ping)
+    monkeypatch.setitem(database._readiness, "checked_at", None)
+    return Pings
+
+
+def test_ready_reuses_a_recent_check(client, pings, monkeypatch):
+    monkeypatch.setattr(settings, "READINESS_CACHE_SECONDS", 60.0)
+
+    for _ in range(3):
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json() == {"status": "ready"}
+    assert pings.count == 1
+
+
+def test_ready_fails_while_the_database_is_down(client, pings, monkeypatch):
+    monkeypatch.setattr(settings, "READINESS_CACHE_SECONDS", 0.0)
+    pings.error = ConnectionError("connection refused")
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json() == {"status": "unavailable", "database": "connection refused"}
+
+    pings.error = None
+    assert client.get("/ready").status_code == 200
+    assert pings.count == 2
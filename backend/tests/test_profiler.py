@@ -0,0 +1,29 @@
+from app.core.config import settings
+
+
+def test_disabled_profiler_is_not_found_even_without_credentials(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", False)
+    response = client.post("/api/v1/admin/profile?seconds=0.1")
+    assert response.status_code == 404
+
+
+def test_enabled_profiler_requires_an_admin(client, make_user, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    assert client.post("/api/v1/admin/profile?seconds=0.1").status_code == 401
+
+    headers, _ = make_user()
+    assert client.post("/api/v1/admin/profile?seconds=0.1", headers=headers).status_code == 403
+
+
+def test_profile_samples_the_event_loop(client, make_user, monkeypatch):
+    headers, _ = make_user()
+    email = client.get("/api/v1/users/me/", headers=headers).json()["email"]
+    monkeypatch.setattr(settings, "PROFILER_ENABLED", True)
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", [email])
+
+    response = client.post("/api/v1/admin/profile?seconds=0.2&interval_ms=1", headers=headers)
+
+    assert response.status_code == 200
+    assert int(response.headers["X-Profile-Samples"]) > 0
+    # An idle loop waits in select
+    assert "_run_once" in response.text
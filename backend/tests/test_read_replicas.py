@@ -0,0 +1,66 @@
+from itertools import cycle
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import database
+from app.core.database import (
+    AsyncSessionLocal,
+    ReadYourWritesMiddleware,
+    get_sessionmaker,
+    primary_until_token,
+)
+
+
+@pytest.fixture
+def replica(monkeypatch):
+    replica = object()
+    monkeypatch.setattr(database, "_replica_rotation", cycle([replica]))
+    return replica
+
+
+@pytest.fixture
+def routed():
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    @app.api_route("/", methods=["GET", "POST"])
+    async def which(session_local=Depends(get_sessionmaker)):
+        return {"primary": session_local is AsyncSessionLocal}
+
+    with TestClient(app) as client:
+        yield client
+
+
+def test_reads_go_to_the_replica_without_a_recent_write(routed, replica):
+    assert routed.get("/").json() == {"primary": False}
+
+
+def test_cookie_from_a_write_pins_the_next_reads(routed, replica):
+    response = routed.post("/")
+    assert response.json() == {"primary": True}
+    assert response.headers["x-primary-until"] == routed.cookies["primary_until"]
+    assert routed.get("/").json() == {"primary": True}
+
+
+def test_header_pins_reads_for_clients_without_cookies(routed, replica):
+    token = routed.post("/").headers["x-primary-until"]
+    routed.cookies.clear()
+    assert routed.get("/").json() == {"primary": False}
+    assert routed.get("/", headers={"X-Primary-Until": token}).json() == {"primary": True}
+
+
+def tampered(token: str) -> str:
+    return token[:-1] + ("1" if token.endswith("0") else "0")
+
+
+@pytest.mark.parametrize("token", [
+    primary_until_token(time.time() - 1),
+    tampered(primary_until_token(time.time() + 60)),
+    f"{time.time() + 60:.3f}.forged",
+    "garbage",
+])
+def test_expired_or_forged_tokens_are_ignored(routed, replica, token):
+    assert routed.get("/", headers={"X-Primary-Until": token}).json() == {"primary": False}
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from app.core import database
+from app.core.database import create_db_and_tables
+from app.core.migrations import SchemaOutOfDate, current_revisions, head_revisions
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engine(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'startup.db'}")
+    monkeypatch.setattr(database, "async_engine", engine)
+    yield engine
+    await engine.dispose()
+
+
+async def test_empty_database_is_created_and_stamped_at_head(engine):
+    await create_db_and_tables()
+
+    async with engine.connect() as conn:
+        assert await current_revisions(conn) == head_revisions()
+        await conn.execute(text("SELECT count(*) FROM users"))
+
+
+async def test_existing_unversioned_database_is_left_for_alembic(engine):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    with pytest.raises(SchemaOutOfDate, match="alembic stamp 0001 && alembic upgrade head"):
+        await create_db_and_tables()
+
+    async with engine.connect() as conn:
+        assert await current_revisions(conn) == frozenset()